@@ -1,25 +1,27 @@
 import os
+import json
+import time
+import hashlib
+import sqlite3
+from contextlib import closing
+from datetime import date
+from functools import cached_property, lru_cache
+from typing import TYPE_CHECKING
 
-import openai
 import pydantic
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    import httpx
+    import openai
+
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-summary_prompt = """
-<Topic>
-{topic}
-</Topic>
-
-<Instructions>
-Only return the NewsTopicWrap object. Do not return anything else.
-Do not prompt the user for anything.
-Use the web_search tool to get the latest news and events.
-</Instructions>
-
+# Output rules shared by every request shape, so the prompts can't drift apart
+output_constraints = """
 <Tweet>
 Constraints: <=260 chars, no emojis/hashtags/links. Return tweet text only.
 </Tweet>
@@ -33,6 +35,59 @@ Return a list of citations with full source URLs.
 </Citations>
 """
 
+# Static instructions go first and the per-topic text last: OpenAI's prompt
+# cache matches on the request prefix, so every topic shares the cached
+# instruction block and only the short <Topic> tail is billed at full rate.
+summary_instructions = """
+<Instructions>
+Only return the NewsTopicWrap object for the topic in the user message. Do not return anything else.
+Do not prompt the user for anything.
+Use the web_search tool to get the latest news and events.
+</Instructions>
+""" + output_constraints
+
+summary_prompt = """
+<Topic>
+{topic}
+</Topic>
+"""
+
+bundle_instructions = """
+<Instructions>
+Only return the NewsBundle object, with exactly one item per topic in the user message.
+Set each item's topic_id to the id shown in brackets before the topic.
+Do not prompt the user for anything.
+Use the web_search tool to get the latest news and events for every topic.
+</Instructions>
+""" + output_constraints
+
+bundle_prompt = """
+<Topics>
+{topics}
+</Topics>
+"""
+
+pair_instructions = """
+<Instructions>
+Only return the NewsTopicPair object. Do not return anything else.
+Do not prompt the user for anything.
+Use the web_search tool to get the latest news and events.
+"primary" covers the primary topic in the user message.
+"response" is posted by a second account as a reply to the primary tweet, written from the responder topic's perspective.
+Make the response conversational and add your own perspective.
+</Instructions>
+""" + output_constraints
+
+pair_prompt = """
+<PrimaryTopic>
+{primary_topic}
+</PrimaryTopic>
+
+<ResponderTopic>
+{responder_topic}
+</ResponderTopic>
+"""
+
 us_market_wrap_topic = """US Markets. Focus on major indices (S&P 500, Nasdaq, Dow) and primary drivers. Give a concise, objective 
 summary of the topic using web search. Look at recent news and events. Look at the week ahead and predict the most important events.
 """
@@ -44,29 +99,327 @@ class NewsTopicWrap(pydantic.BaseModel):
     citations: list[str]
 
 
+class NewsTopicPair(pydantic.BaseModel):
+    primary: NewsTopicWrap
+    response: NewsTopicWrap
+
+
+class NewsBundleItem(NewsTopicWrap):
+    topic_id: str
+
+
+class NewsBundle(pydantic.BaseModel):
+    items: list[NewsBundleItem]
+
+
+def _http_limits() -> "httpx.Limits":
+    import httpx
+
+    return httpx.Limits(max_connections=20, max_keepalive_connections=20)
+
+
+def _max_retries() -> int:
+    # The SDK retries 429/5xx itself with jittered exponential backoff (and
+    # honours Retry-After); 2 attempts is too few for concurrent fan-out.
+    return int(os.environ.get("OPENAI_MAX_RETRIES", "5"))
+
+
+@lru_cache(maxsize=1)
+def _openai_client() -> "openai.OpenAI":
+    """Process-wide OpenAI client.
+
+    Every Generator shares this instance so keep-alive connections (and their
+    TLS sessions) are reused across calls instead of being rebuilt per object.
+    openai is imported here rather than at module load, since importing it
+    costs more than most callers (DRY_RUN, --help, cache hits) ever need.
+    """
+    import openai
+
+    return openai.OpenAI(
+        api_key=os.environ.get("OPENAI_API_KEY", ""),
+        max_retries=_max_retries(),
+        http_client=openai.DefaultHttpxClient(limits=_http_limits()),
+    )
+
+
+MODEL = "gpt-5-nano"
+# Bump whenever summary_prompt or NewsTopicWrap changes so cached wraps
+# produced by the old prompt are not served.
+PROMPT_VERSION = "2"
+
+
+class SummaryCache:
+    """SQLite-backed TTL cache of generated wraps, keyed by model/topic/day/prompt version."""
+
+    def __init__(self, path: str, ttl: int):
+        self.path = path
+        self.ttl = ttl
+        with closing(sqlite3.connect(self.path)) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS summaries (key TEXT PRIMARY KEY, payload BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    @staticmethod
+    def key(topic: str) -> str:
+        raw = f"{MODEL}|{topic}|{date.today().isoformat()}|{PROMPT_VERSION}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, topic: str) -> NewsTopicWrap | None:
+        with closing(sqlite3.connect(self.path)) as conn:
+            row = conn.execute(
+                "SELECT payload FROM summaries WHERE key = ? AND expires_at > ?",
+                (self.key(topic), time.time()),
+            ).fetchone()
+        # Validate the stored JSON bytes directly in pydantic-core rather than
+        # json.loads + NewsTopicWrap(**data).
+        return NewsTopicWrap.model_validate_json(row[0]) if row else None
+
+    def set(self, topic: str, wrap: NewsTopicWrap) -> None:
+        with closing(sqlite3.connect(self.path)) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO summaries (key, payload, expires_at) VALUES (?, ?, ?)",
+                (self.key(topic), wrap.model_dump_json().encode("utf-8"), time.time() + self.ttl),
+            )
+
+
+@lru_cache(maxsize=64)
+def _render_summary_prompt(topic: str) -> str:
+    # Callers reuse a handful of fixed topic descriptions (poster.TOPICS), so
+    # each prompt is formatted once per process instead of once per request.
+    return summary_prompt.format(topic=topic)
+
+
+def _request(instructions: str, prompt: str, text_format: type[pydantic.BaseModel], cache_key: str) -> dict:
+    # responses.parse kwargs shared by the summary, pair and bundle requests
+    return dict(
+        model=MODEL,
+        input=[
+            {"role": "developer", "content": instructions},
+            {"role": "user", "content": prompt},
+        ],
+        tools=[{"type": "web_search"}],
+        reasoning={"effort": "low"},
+        text_format=text_format,
+        tool_choice="auto",
+        prompt_cache_key=cache_key,
+    )
+
+
+def _summary_request(topic: str) -> dict:
+    return _request(summary_instructions, _render_summary_prompt(topic), NewsTopicWrap, "poster-summary")
+
+
+def _pair_request(primary_topic: str, responder_topic: str) -> dict:
+    prompt = pair_prompt.format(primary_topic=primary_topic, responder_topic=responder_topic)
+    return _request(pair_instructions, prompt, NewsTopicPair, "poster-pair")
+
+
+def _bundle_request(topics: dict[str, str]) -> dict:
+    topic_lines = "\n".join(f"[{topic_id}] {description}" for topic_id, description in topics.items())
+    return _request(bundle_instructions, bundle_prompt.format(topics=topic_lines), NewsBundle, "poster-bundle")
+
+
+def _parsed_pair(resp) -> tuple[NewsTopicWrap, NewsTopicWrap]:
+    logger.debug(resp)
+
+    if not resp.output:
+        raise RuntimeError("No output from OpenAI")
+    if not isinstance(resp.output_parsed, NewsTopicPair):
+        raise RuntimeError("Output is not a NewsTopicPair")
+
+    return resp.output_parsed.primary, resp.output_parsed.response
+
+
+def _batch_request_body(topic: str) -> dict:
+    """Raw /v1/responses body equivalent to _summary_request, for the Batch API.
+
+    responses.parse derives the JSON schema from text_format client-side; a
+    batch line has to spell it out.
+    """
+    body = {k: v for k, v in _summary_request(topic).items() if k != "text_format"}
+    schema = NewsTopicWrap.model_json_schema()
+    schema["additionalProperties"] = False
+    body["text"] = {"format": {"type": "json_schema", "name": "NewsTopicWrap", "schema": schema, "strict": True}}
+    return body
+
+
+def _batch_output_text(body: dict) -> str:
+    return "".join(
+        part.get("text", "")
+        for item in body.get("output") or []
+        if item.get("type") == "message"
+        for part in item.get("content") or []
+        if part.get("type") == "output_text"
+    )
+
+
+def _parsed_summary(resp) -> NewsTopicWrap:
+    logger.debug(resp)
+
+    if not resp.output:
+        raise RuntimeError("No output from OpenAI")
+    if not isinstance(resp.output_parsed, NewsTopicWrap):
+        raise RuntimeError("Output is not a MarketWrap")
+
+    return resp.output_parsed
+
+
 class Generator:
-    def __init__(self):
-        self.openai_client = openai.OpenAI(api_key=os.environ.get("OPENAI_API_KEY", ""))
-
-    def generate_summary(self, topic: str=us_market_wrap_topic) -> NewsTopicWrap:
-        resp = self.openai_client.responses.parse(
-            model="gpt-5-nano",
-            input=[{"role": "user", "content": summary_prompt.format(topic=topic)}],
-            tools=[{"type": "web_search"}],
-            reasoning={ "effort": "low"},
-            text_format=NewsTopicWrap,
-            tool_choice="auto",
+    @property
+    def openai_client(self) -> "openai.OpenAI":
+        # Built on first use so constructing a Generator (e.g. in DRY_RUN or
+        # import-only paths) doesn't pay for the HTTP client / TLS setup.
+        return _openai_client()
+
+    @cached_property
+    def async_openai_client(self) -> "openai.AsyncOpenAI":
+        # Async pools are bound to the event loop that opened them, so this one
+        # is per Generator rather than process-wide: use a Generator within a
+        # single asyncio.run().
+        import openai
+
+        return openai.AsyncOpenAI(
+            api_key=os.environ.get("OPENAI_API_KEY", ""),
+            max_retries=_max_retries(),
+            http_client=openai.DefaultAsyncHttpxClient(limits=_http_limits()),
         )
 
+    @cached_property
+    def summary_cache(self) -> SummaryCache | None:
+        # SUMMARY_CACHE_TTL=0 disables caching entirely.
+        ttl = int(os.environ.get("SUMMARY_CACHE_TTL", "900"))
+        if ttl <= 0:
+            return None
+        try:
+            return SummaryCache(os.environ.get("SUMMARY_CACHE_PATH", ".summary_cache.sqlite3"), ttl)
+        except sqlite3.Error as exc:
+            logger.warning("Summary cache unavailable (%s); continuing without it", exc)
+            return None
+
+    def cached_summary(self, topic: str) -> NewsTopicWrap | None:
+        """Return the cached wrap for topic, if any, without calling the API."""
+        if self.summary_cache is None:
+            return None
+        try:
+            wrap = self.summary_cache.get(topic)
+        except (sqlite3.Error, pydantic.ValidationError) as exc:
+            logger.warning("Summary cache read failed: %s", exc)
+            return None
+        if wrap is not None:
+            logger.info("Using cached summary for topic")
+        return wrap
+
+    def _cache_summary(self, topic: str, wrap: NewsTopicWrap) -> None:
+        if self.summary_cache is None:
+            return
+        try:
+            self.summary_cache.set(topic, wrap)
+        except sqlite3.Error as exc:
+            logger.warning("Summary cache write failed: %s", exc)
+
+    def generate_summary(self, topic: str=us_market_wrap_topic, refresh: bool=False) -> NewsTopicWrap:
+        """Generate a wrap for topic; refresh=True skips the cache lookup (the result is still cached)."""
+        cached = None if refresh else self.cached_summary(topic)
+        if cached is not None:
+            return cached
+        resp = self.openai_client.responses.parse(**_summary_request(topic))
+        wrap = _parsed_summary(resp)
+        self._cache_summary(topic, wrap)
+        return wrap
+
+    async def generate_summary_async(self, topic: str=us_market_wrap_topic, refresh: bool=False) -> NewsTopicWrap:
+        cached = None if refresh else self.cached_summary(topic)
+        if cached is not None:
+            return cached
+        resp = await self.async_openai_client.responses.parse(**_summary_request(topic))
+        wrap = _parsed_summary(resp)
+        self._cache_summary(topic, wrap)
+        return wrap
+
+    async def generate_pair_async(self, primary_topic: str, responder_topic: str) -> tuple[NewsTopicWrap, NewsTopicWrap]:
+        """Generate a primary wrap and the responder's reply to it in one request.
+
+        Conversation mode needs both tweets; one round-trip (sharing the same
+        web searches) replaces generating the reply after the primary returns.
+        """
+        resp = await self.async_openai_client.responses.parse(**_pair_request(primary_topic, responder_topic))
+        return _parsed_pair(resp)
+
+    def generate_bundle(self, topics: dict[str, str]) -> dict[str, NewsTopicWrap]:
+        """Generate wraps for several topics ({topic_id: description}) in ONE request.
+
+        Shares the instructions and reasoning budget across topics instead of
+        paying for them per call. Topics the model leaves out are missing from
+        the result.
+        """
+        resp = self.openai_client.responses.parse(**_bundle_request(topics))
+
         logger.debug(resp)
 
         if not resp.output:
             raise RuntimeError("No output from OpenAI")
-        if not isinstance(resp.output_parsed, NewsTopicWrap):
-            raise RuntimeError("Output is not a MarketWrap")
+        if not isinstance(resp.output_parsed, NewsBundle):
+            raise RuntimeError("Output is not a NewsBundle")
+
+        return {
+            item.topic_id: NewsTopicWrap.model_validate(item.model_dump(exclude={"topic_id"}))
+            for item in resp.output_parsed.items
+            if item.topic_id in topics
+        }
+
+    def submit_batch(self, topics: dict[str, str]) -> str:
+        """Queue one summary request per topic ({topic_id: description}) on the Batch API.
+
+        Batch jobs are billed at half price and draw from a separate rate-limit
+        pool, at the cost of finishing asynchronously (within 24h). Returns the
+        batch id to hand to poll_batch.
+        """
+        lines = [
+            json.dumps({"custom_id": topic_id, "method": "POST", "url": "/v1/responses", "body": _batch_request_body(description)})
+            for topic_id, description in topics.items()
+        ]
+        batch_file = self.openai_client.files.create(
+            file=("summaries.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch",
+        )
+        batch = self.openai_client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/responses",
+            completion_window="24h",
+        )
+        logger.info("Submitted batch %s with %d requests", batch.id, len(lines))
+        return batch.id
+
+    def poll_batch(self, batch_id: str) -> dict[str, NewsTopicWrap] | None:
+        """Return {topic_id: wrap} for a finished batch, or None while it is still running.
 
-        return resp.output_parsed
+        Requests that failed or returned unparsable output are logged and left out.
+        """
+        batch = self.openai_client.batches.retrieve(batch_id)
+        if batch.status in ("validating", "in_progress", "finalizing"):
+            return None
+        if batch.status != "completed":
+            raise RuntimeError(f"Batch {batch_id} ended with status {batch.status}")
+        if batch.error_file_id:
+            logger.warning("Batch %s has failed requests; see file %s", batch_id, batch.error_file_id)
+        if not batch.output_file_id:
+            return {}
 
+        wraps = {}
+        content = self.openai_client.files.content(batch.output_file_id).text
+        for line in content.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            if response.get("status_code") != 200:
+                logger.warning("Batch request %s failed: %s", record.get("custom_id"), record.get("error") or response)
+                continue
+            try:
+                wraps[record["custom_id"]] = NewsTopicWrap.model_validate_json(_batch_output_text(response["body"]))
+            except pydantic.ValidationError as exc:
+                logger.warning("Batch request %s returned invalid output: %s", record.get("custom_id"), exc)
+        return wraps
 
 
 if __name__ == "__main__":
@@ -0,0 +1,71 @@
+import dataclasses
+import json
+import mmap
+import os
+from typing import Any
+
+# orjson is optional: it's much faster on larger queues, but everything works
+# with the stdlib encoder when it isn't installed.
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    # Mirrors orjson, which serializes dataclasses natively.
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def loads(data: str | bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load_file(path: str) -> Any:
+    """Parse the JSON file at path straight from an mmap of it.
+
+    orjson reads the mapped pages directly, skipping the read() copy; the
+    stdlib parser needs bytes, so it gets one copy out of the map.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return loads(b"")  # mmap can't map an empty file; raise the usual decode error
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if orjson is not None:
+                with memoryview(mm) as view:
+                    return orjson.loads(view)
+            return json.loads(mm[:])
+
+
+def dumps(obj: Any, pretty: bool = False) -> bytes:
+    """Encode obj as UTF-8 JSON bytes: compact, or indented by two spaces when pretty."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        return orjson.dumps(obj, option=option)
+    if pretty:
+        return json.dumps(obj, ensure_ascii=False, indent=2, default=_default).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def write_atomic(path: str, obj: Any, pretty: bool = False) -> None:
+    """Write obj as JSON to path via a temp file + rename, so readers never see a partial file.
+
+    The data is fsynced before the rename and the directory after it, so a
+    crash leaves either the old file or the new one, never an empty one.
+    """
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(dumps(obj, pretty=pretty))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
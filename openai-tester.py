@@ -15,37 +15,33 @@ resp = client.responses.create(
     tool_choice="auto",                         # let the model decide when to search
 )
 
-# ---- Print the answer text
-text_chunks = []
-for item in resp.output:
-    for part in getattr(item, "content", []) or []:
-        if getattr(part, "type", None) == "output_text":
-            text_chunks.append(part.text)
-print("\n".join(text_chunks).strip())
-
-# ---- Print any links the tool returned (defensive parsing: schema can vary)
-def extract_links(r):
-    links = set()
-    for item in r.output:
+# ---- Walk the output once, yielding answer text and any links the tool returned
+# (defensive parsing: schema can vary)
+def walk(r):
+    for item in r.output or []:
         # Some SDK builds attach citations/references at the item or part level
-        if getattr(item, "references", None):
-            for ref in item.references:
-                url = getattr(ref, "url", None)
-                if url: links.add(url)
+        for ref in getattr(item, "references", None) or []:
+            url = getattr(ref, "url", None)
+            if url: yield ("link", url)
         for part in getattr(item, "content", []) or []:
-            # Newer schema: references on parts
+            if getattr(part, "type", None) == "output_text":
+                yield ("text", part.text)
+            # Newer schema (and tool_result blocks): references on parts
             for ref in getattr(part, "references", []) or []:
                 url = getattr(ref, "url", None)
-                if url: links.add(url)
-            # Tool results sometimes arrive as structured blocks
-            if getattr(part, "type", None) == "tool_result":
-                for ref in getattr(part, "references", []) or []:
-                    url = getattr(ref, "url", None)
-                    if url: links.add(url)
-    return sorted(links)
+                if url: yield ("link", url)
+
+text_chunks = []
+links = set()
+for kind, value in walk(resp):
+    if kind == "text":
+        text_chunks.append(value)
+    else:
+        links.add(value)
+
+print("\n".join(text_chunks).strip())
 
-links = extract_links(resp)
 if links:
     print("\nSources:")
-    for u in links:
-        print("-", u)
\ No newline at end of file
+    for u in sorted(links):
+        print("-", u)
@@ -1,22 +1,71 @@
 import os
+import re
+import sys
+import asyncio
 import logging
-import argparse
+import unicodedata
+from contextlib import AbstractAsyncContextManager, asynccontextmanager, nullcontext
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass
+from enum import Enum
+from functools import lru_cache, partial
+from types import MappingProxyType
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Iterator, Sequence
 from dotenv import load_dotenv  
 
-import tweepy
-from openai import OpenAI
-
+from ratelimit import (
+    DEFAULT_PATH as RATELIMIT_PATH,
+    AsyncRateLimiter,
+    CredentialPool,
+    PostBudget,
+    RotationStrategy,
+    reset_from_response,
+)
 from generator import NewsTopicWrap, Generator
 
+if TYPE_CHECKING:
+    import argparse
+
 
 load_dotenv()
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 DRY_RUN = os.getenv("DRY_RUN", "0") == "1"
 MAX_TWEET_LEN = 280
+MAX_CONCURRENCY = int(os.getenv("MAX_CONCURRENCY", "4"))
+# Concurrent generations raced per tweet once a first draft came back too long;
+# the first one that fits wins
+TWEET_CANDIDATES = int(os.getenv("TWEET_CANDIDATES", "3"))
+TWEET_ROUNDS = 2
+OPENAI_RPM = int(os.getenv("OPENAI_RPM", "0"))
+# Write budget shared across runs on this machine, checked before every post.
+POST_BUDGET = PostBudget(
+    os.getenv("X_RATELIMIT_PATH", RATELIMIT_PATH),
+    limit=int(os.getenv("X_POST_LIMIT", "300")),
+    window=float(os.getenv("X_POST_WINDOW", "10800")),
+)
+POST_ROUTE = "create_tweet"
+# account_prefix value that lets the credential pool pick the account
+AUTO_ACCOUNT = "auto"
+# Posting is rate-limited per 15 minutes rather than per second, so a couple
+# of workers is enough to hide post latency behind the next generation.
+_POST_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="post")
+# How long a v2 post gets before v1.1 is raced against it. Well above normal
+# create_tweet latency, so only a stalled post is hedged: if both attempts go
+# through, the tweet is posted twice.
+X_HEDGE_DELAY = int(os.getenv("X_HEDGE_DELAY_MS", "5000")) / 1000
+_HEDGE_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hedge")
+ALL_TOPICS = "all"
+SECONDARY_ACCOUNT_PREFIX = "X2"
+
+# ANSI color codes for colored terminal output
+_CYAN = "\033[96m"
+_GREEN = "\033[92m"
+_YELLOW = "\033[93m"
+_RESET = "\033[0m"
 
 
 # Topic definitions
-TOPICS = {
+_TOPICS_RAW = {
     "us-markets": """US Markets. Focus on major indices (S&P 500, Nasdaq, Dow) and primary drivers. Give a concise, objective 
 summary of the topic using web search. Look at recent news and events. Look at the week ahead and predict the most important events.""",
     
@@ -37,19 +86,49 @@ affecting global markets. Include European, Asian, and emerging market performan
     "tech-news": """Tech News. Focus on major technology companies, product launches, earnings, acquisitions, and industry trends. 
 Include AI, software, hardware, and startup news. Look at recent developments and what's trending in tech."""
 }
+# Read-only view so importers (queue_build) can't mutate the table.
+TOPICS = MappingProxyType(_TOPICS_RAW)
+TOPIC_KEYS = tuple(_TOPICS_RAW)
+_TOPIC_CHOICES = (*TOPIC_KEYS, ALL_TOPICS)
+
+
+@dataclass(frozen=True, slots=True)
+class TwitterCreds:
+    consumer_key: str
+    consumer_secret: str
+    access_token: str
+    access_secret: str
+
+
+# '{PREFIX}_X_CONSUMER_KEY' etc.; the prefix is optional so the unprefixed
+# 'X_CONSUMER_KEY' names keep working for the default account.
+_CRED_VAR = re.compile(r"^(?:(\w+?)_)?X_(CONSUMER_KEY|CONSUMER_SECRET|ACCESS_TOKEN|ACCESS_TOKEN_SECRET)$")
+_CRED_FIELDS = {
+    "CONSUMER_KEY": "consumer_key",
+    "CONSUMER_SECRET": "consumer_secret",
+    "ACCESS_TOKEN": "access_token",
+    "ACCESS_TOKEN_SECRET": "access_secret",
+}
 
 
-def _get_env_with_prefix(prefix: str | None, var_suffix: str) -> str | None:
-    """Read env var with optional prefix convention: '{PREFIX}_{SUFFIX}'.
+@lru_cache(maxsize=1)
+def _all_twitter_credentials() -> dict[str, TwitterCreds]:
+    """Scan the environment once and group X credentials by account prefix ('' = unprefixed).
 
-    If prefix is falsy/empty, read just '{SUFFIX}'. This keeps backward-compat
-    with existing unprefixed variables such as 'X_CONSUMER_KEY'.
+    Runs on first use rather than at import, so runs that never post skip
+    the scan and variables set after import (by a script embedding poster,
+    say) are still picked up. Prefixes missing any of the four variables are
+    left out.
     """
-    key = f"{prefix}_{var_suffix}" if prefix else var_suffix
-    return os.environ.get(key)
+    found: dict[str, dict[str, str]] = {}
+    for key, value in os.environ.items():
+        match = _CRED_VAR.match(key)
+        if match and value:
+            found.setdefault(match.group(1) or "", {})[_CRED_FIELDS[match.group(2)]] = value
+    return {prefix: TwitterCreds(**fields) for prefix, fields in found.items() if len(fields) == len(_CRED_FIELDS)}
 
 
-def _load_twitter_credentials(prefix: str | None):
+def _load_twitter_credentials(prefix: str | None) -> TwitterCreds | None:
     """Load credentials for a given account prefix.
 
     Expected suffix names (kept for backward compatibility with existing envs):
@@ -60,18 +139,66 @@ def _load_twitter_credentials(prefix: str | None):
 
     With a prefix 'ALT', variables become: 'ALT_X_CONSUMER_KEY', ...
     """
-    consumer_key = _get_env_with_prefix(prefix, "X_CONSUMER_KEY")
-    consumer_secret = _get_env_with_prefix(prefix, "X_CONSUMER_SECRET")
-    access_token = _get_env_with_prefix(prefix, "X_ACCESS_TOKEN")
-    access_secret = _get_env_with_prefix(prefix, "X_ACCESS_TOKEN_SECRET")
-    if not all([consumer_key, consumer_secret, access_token, access_secret]):
-        return None
-    return {
-        "consumer_key": consumer_key,
-        "consumer_secret": consumer_secret,
-        "access_token": access_token,
-        "access_secret": access_secret,
-    }
+    return _all_twitter_credentials().get(prefix or "")
+
+
+@lru_cache(maxsize=1)
+def _credential_pool() -> CredentialPool:
+    strategy = RotationStrategy(os.getenv("POSTER_ROTATION", RotationStrategy.FILL_FIRST.value).lower())
+    # Sorted so the unprefixed account comes first for fill-first
+    return CredentialPool(sorted(_all_twitter_credentials()), POST_BUDGET, POST_ROUTE, strategy)
+
+
+class PostFailure(Enum):
+    NO_BUDGET = "no budget"  # refused locally, nothing was sent
+    RATE_LIMITED = "rate limited"  # X answered 429
+    UNAUTHORIZED = "unauthorized"  # X rejected the credentials
+    ERROR = "error"  # anything else; the tweet may still have been created
+
+
+# Failures that say nothing was posted, so the same text can safely go out again
+# from another account or on a later run
+NOT_POSTED = frozenset({PostFailure.NO_BUDGET, PostFailure.RATE_LIMITED, PostFailure.UNAUTHORIZED})
+# Prefixes X rejected during this process; "auto" stops picking them until the next run.
+# Kept out of POST_BUDGET so fixed credentials work straight away.
+_rejected_prefixes: set[str] = set()
+
+
+def _rotation() -> Iterator[str]:
+    """Account prefixes to try in turn, as the credential pool picks them.
+
+    The caller moves on to the next one only on a NOT_POSTED failure; any
+    other failure stops there, since a timeout or 5xx may have posted the
+    tweet already and another account would post it twice.
+    """
+    pool = _credential_pool()
+    tried: set[str] = set()
+    while (prefix := pool.next(exclude=tried | _rejected_prefixes)) is not None:
+        tried.add(prefix)
+        yield prefix
+    logging.warning("No account with post budget left; skipping (tried %s).", sorted(tried))
+
+
+def _post_rotating(text: str, reply_to: str | None) -> str | None:
+    for prefix in _rotation():
+        result = _post_as(text, reply_to, prefix)
+        if result not in NOT_POSTED:
+            return None if isinstance(result, PostFailure) else result
+    return None
+
+
+def _failure_from(exc: Exception, prefix: str) -> PostFailure:
+    """Classify a failed post, recording a 429 in POST_BUDGET and rejected credentials in-process."""
+    import tweepy
+
+    if isinstance(exc, tweepy.TooManyRequests):
+        POST_BUDGET.set_reset(prefix, POST_ROUTE, reset_from_response(exc.response))
+        return PostFailure.RATE_LIMITED
+    if isinstance(exc, tweepy.Unauthorized):
+        logging.error("X rejected the credentials for prefix=%s; check its X_* variables: %s", prefix, exc)
+        _rejected_prefixes.add(prefix)
+        return PostFailure.UNAUTHORIZED
+    return PostFailure.ERROR
 
 
 def get_responder_topic(primary_topic: str) -> str:
@@ -90,9 +217,78 @@ def get_responder_topic(primary_topic: str) -> str:
     return responder_mapping.get(primary_topic, "General Commentary. Provide thoughtful response and analysis.")
 
 # Text Helpers
+# twitter-text v3 weights: code points in these ranges count 1, everything
+# else (CJK, most symbols) counts 2. Emoji sequences count 2 as a whole.
+_LIGHT_RANGES = ((0x0000, 0x10FF), (0x2000, 0x200D), (0x2010, 0x201F), (0x2032, 0x2037))
+_ELLIPSIS = "…"
+# Any whitespace that isn't already a lone space
+_WS_RUN = re.compile(r"\s{2,}|[^\S ]")
+
+
+def _char_weight(ch: str) -> int:
+    cp = ord(ch)
+    return 1 if any(lo <= cp <= hi for lo, hi in _LIGHT_RANGES) else 2
+
+
+def _extends_cluster(cluster: str, ch: str) -> bool:
+    cp = ord(ch)
+    prev = cluster[-1]
+    if prev == "\u200d":  # zero-width joiner glues the next character on
+        return True
+    if ch == "\u200d" or unicodedata.category(ch) in ("Mn", "Mc", "Me"):
+        return True
+    if 0xFE00 <= cp <= 0xFE0F or 0xE0100 <= cp <= 0xE01EF:  # variation selectors
+        return True
+    if 0x1F3FB <= cp <= 0x1F3FF or 0xE0020 <= cp <= 0xE007F:  # skin tones, tag sequences
+        return True
+    if 0x1F1E6 <= cp <= 0x1F1FF:  # regional indicators pair up into flags
+        return len(cluster) == 1 and 0x1F1E6 <= ord(prev) <= 0x1F1FF
+    return prev == "\r" and ch == "\n"
+
+
+def _graphemes(text: str) -> Iterator[str]:
+    """Split text into (approximate) extended grapheme clusters."""
+    cluster = ""
+    for ch in text:
+        if cluster and not _extends_cluster(cluster, ch):
+            yield cluster
+            cluster = ""
+        cluster += ch
+    if cluster:
+        yield cluster
+
+
+def _grapheme_weight(cluster: str) -> int:
+    if any(ord(ch) >= 0x1F000 or ch in "\u200d\ufe0f" for ch in cluster):
+        return 2
+    return sum(_char_weight(ch) for ch in cluster)
+
+
+def tweet_length(text: str) -> int:
+    """Length of text as X counts it (NFC-normalized, weighted per twitter-text)."""
+    text = unicodedata.normalize("NFC", text or "")
+    if text.isascii():
+        return len(text)
+    return sum(_grapheme_weight(g) for g in _graphemes(text))
+
+
 def clamp_tweet(text: str, max_len: int = 280) -> str:
-    text = " ".join((text or "").strip().split())
-    return text if len(text) <= max_len else text[: max_len - 1] + "…"
+    text = unicodedata.normalize("NFC", (text or "").strip())
+    # Collapse whitespace runs in one pass; single-spaced text has no match
+    # and comes back unchanged.
+    text = _WS_RUN.sub(" ", text)
+    if tweet_length(text) <= max_len:
+        return text
+    # Cut on a grapheme boundary so flags, ZWJ sequences and accented letters
+    # are never split, leaving room for the ellipsis.
+    budget = max_len - _char_weight(_ELLIPSIS)
+    kept = []
+    for cluster in _graphemes(text):
+        budget -= _grapheme_weight(cluster)
+        if budget < 0:
+            break
+        kept.append(cluster)
+    return "".join(kept) + _ELLIPSIS
 
 
 def get_twitter_clients(account_prefix: str | None = None):
@@ -100,217 +296,483 @@ def get_twitter_clients(account_prefix: str | None = None):
 
     Example prefixes: 'ALT', 'BRAND2'. This will read 'ALT_X_CONSUMER_KEY', etc.
     If prefix is None/empty, it reads unprefixed vars for backward compatibility.
+    Clients are built once per prefix and reused for the rest of the process.
     """
+    return _twitter_clients(account_prefix or "")
+
+
+@lru_cache(maxsize=8)
+def _twitter_clients(account_prefix: str):
+    import tweepy
+
     creds = _load_twitter_credentials(account_prefix)
     if not creds:
-        raise RuntimeError(f"Missing Twitter credentials for prefix '{account_prefix or ''}'")
+        raise RuntimeError(f"Missing Twitter credentials for prefix '{account_prefix}'")
 
     auth = tweepy.OAuth1UserHandler(
-        creds["consumer_key"],
-        creds["consumer_secret"],
-        creds["access_token"],
-        creds["access_secret"],
+        creds.consumer_key,
+        creds.consumer_secret,
+        creds.access_token,
+        creds.access_secret,
     )
     twitter_client = tweepy.API(auth)
     twitter_client_v2 = tweepy.Client(
-        consumer_key=creds["consumer_key"],
-        consumer_secret=creds["consumer_secret"],
-        access_token=creds["access_token"],
-        access_token_secret=creds["access_secret"],
+        consumer_key=creds.consumer_key,
+        consumer_secret=creds.consumer_secret,
+        access_token=creds.access_token,
+        access_token_secret=creds.access_secret,
     )
     return twitter_client, twitter_client_v2
 
 
-def post_tweet(text: str, account_prefix: str | None = None) -> str | None:
-    """Post the tweet to Twitter, or log if DRY_RUN is enabled. Returns tweet ID."""
-    if DRY_RUN:
-        logging.info("[DRY RUN] Tweet would be (prefix=%s): %s", account_prefix or "", text)
-        return "dry_run_tweet_id"
+def post_wait(account_prefix: str | None = None) -> float:
+    """Seconds until account_prefix may post again (0 if it can now).
 
-    twitter_client, twitter_client_v2 = get_twitter_clients(account_prefix)
+    Lets callers skip work (loading a queue, building clients) while an account
+    is known to be throttled. "auto" waits for the first account in the pool.
+    """
+    if account_prefix == AUTO_ACCOUNT:
+        prefixes = _credential_pool().prefixes
+    else:
+        prefixes = [account_prefix or ""]
+    return min((POST_BUDGET.reset_in(prefix, POST_ROUTE) for prefix in prefixes), default=0.0)
 
-    # Try v2 first
+
+def _v2_tweet_id(resp) -> str | None:
+    data_obj = getattr(resp, "data", None)
+    if isinstance(data_obj, dict):
+        return data_obj.get("id")
+    return getattr(data_obj, "id", None)
+
+
+def _post(
+    text: str, *, reply_to: str | None = None, account_prefix: str | None = None, dry_run: bool | None = None
+) -> str | None:
+    """Post a tweet, or a reply when reply_to is set. Returns tweet ID.
+
+    Tries v2 first and falls back to v1.1. account_prefix="auto" rotates
+    across every configured account. dry_run defaults to DRY_RUN.
+    """
+    if DRY_RUN if dry_run is None else dry_run:
+        kind = "Reply" if reply_to else "Tweet"
+        logging.info("[DRY RUN] %s would be (prefix=%s): %s", kind, account_prefix or "", text)
+        return "dry_run_reply_id" if reply_to else "dry_run_tweet_id"
+    if account_prefix == AUTO_ACCOUNT:
+        return _post_rotating(text, reply_to)
+    result = _post_as(text, reply_to, account_prefix or "")
+    return None if isinstance(result, PostFailure) else result
+
+
+def _post_as(text: str, reply_to: str | None, prefix: str) -> str | PostFailure:
+    """Post from the account with this prefix; a PostFailure says why nothing came back."""
+    kind = "Reply" if reply_to else "Tweet"
+    if not POST_BUDGET.try_consume(prefix, POST_ROUTE):
+        logging.warning("Post budget exhausted (prefix=%s); skipping %s.", prefix, kind.lower())
+        return PostFailure.NO_BUDGET
+
+    # Nothing here is retried: a 5xx or timeout may come back after X has
+    # already created the tweet, and a retry would post it twice. 429s drain
+    # POST_BUDGET until X's reported reset instead.
+    twitter_client, twitter_client_v2 = get_twitter_clients(prefix)
+
+    # v2 first, hedged with v1.1 if it hasn't answered within X_HEDGE_DELAY_MS
+    attempts = []
     if twitter_client_v2 is not None:
-        try:
-            resp = twitter_client_v2.create_tweet(text=text)
-            tweet_id = None
-            if hasattr(resp, "data"):
-                data_obj = resp.data
-                if isinstance(data_obj, dict):
-                    tweet_id = data_obj.get("id")
-                else:
-                    tweet_id = getattr(data_obj, "id", None)
-            logging.info("Tweet posted via v2 (prefix=%s): %s", account_prefix or "", getattr(resp, "data", resp))
-            return tweet_id
-        except Exception as exc:
-            logging.warning("v2 create_tweet failed (prefix=%s) (%s). Falling back to v1.1.", account_prefix or "", exc)
-
-    # Fallback to v1.1
+        attempts.append((
+            "v2",
+            partial(twitter_client_v2.create_tweet, text=text, in_reply_to_tweet_id=reply_to),
+            _v2_tweet_id,
+        ))
     if twitter_client is not None:
-        try:
-            resp = twitter_client.update_status(status=text)
-            tweet_id = resp.id_str if hasattr(resp, "id_str") else None
-            logging.info("Tweet posted via v1.1 (prefix=%s): %s", account_prefix or "", text)
-            return tweet_id
-        except Exception as exc:
-            logging.error("Failed to post tweet (prefix=%s): %s", account_prefix or "", exc)
-            return None
-
-    return None
+        reply_kwargs = {"in_reply_to_status_id": reply_to} if reply_to else {}
+        attempts.append((
+            "v1.1",
+            partial(twitter_client.update_status, status=text, **reply_kwargs),
+            lambda resp: getattr(resp, "id_str", None),
+        ))
+
+    pending = {}
+    failures = []
+    while attempts or pending:
+        if attempts:
+            api, call, tweet_id_of = attempts.pop(0)
+            pending[_HEDGE_POOL.submit(call)] = (api, tweet_id_of)
+        # Give the newest attempt a head start before hedging with the next one.
+        done, _ = wait(pending, timeout=X_HEDGE_DELAY if attempts else None, return_when=FIRST_COMPLETED)
+        for future in done:
+            api, tweet_id_of = pending.pop(future)
+            try:
+                resp = future.result()
+            except Exception as exc:
+                failure = _failure_from(exc, prefix)
+                failures.append(failure)
+                if failure is not PostFailure.ERROR:
+                    attempts.clear()  # throttled or rejected on every API alike
+                logging.warning("%s %s failed (prefix=%s): %s", api, kind.lower(), prefix, exc)
+                continue
+            # Whatever a still-running attempt does from here on is ignored.
+            logging.info("%s posted via %s (prefix=%s): %s", kind, api, prefix, text)
+            return tweet_id_of(resp)
+
+    # Every attempt has finished without a tweet. Only report a clean failure
+    # (one the caller may rotate on) if none of them might have posted.
+    logging.error("Failed to post %s (prefix=%s)", kind.lower(), prefix)
+    if failures and PostFailure.ERROR not in failures:
+        return failures[0]
+    return PostFailure.ERROR
+
+
+def post_tweet(text: str, account_prefix: str | None = None, dry_run: bool | None = None) -> str | None:
+    """Post the tweet to Twitter, or log if DRY_RUN is enabled. Returns tweet ID."""
+    return _post(text, account_prefix=account_prefix, dry_run=dry_run)
 
 
-def post_reply_tweet(text: str, reply_to_tweet_id: str, account_prefix: str | None = None) -> str | None:
+def post_reply_tweet(
+    text: str, reply_to_tweet_id: str, account_prefix: str | None = None, dry_run: bool | None = None
+) -> str | None:
     """Post a reply tweet to Twitter."""
-    if DRY_RUN:
-        logging.info("[DRY RUN] Reply tweet would be (prefix=%s): %s", account_prefix or "", text)
-        return "dry_run_reply_id"
+    return _post(text, reply_to=reply_to_tweet_id, account_prefix=account_prefix, dry_run=dry_run)
 
-    twitter_client, twitter_client_v2 = get_twitter_clients(account_prefix)
 
-    # Try v2 first
-    if twitter_client_v2 is not None:
-        try:
-            resp = twitter_client_v2.create_tweet(text=text, in_reply_to_tweet_id=reply_to_tweet_id)
-            tweet_id = None
-            if hasattr(resp, "data"):
-                data_obj = resp.data
-                if isinstance(data_obj, dict):
-                    tweet_id = data_obj.get("id")
-                else:
-                    tweet_id = getattr(data_obj, "id", None)
-            logging.info("Reply posted via v2 (prefix=%s): %s", account_prefix or "", getattr(resp, "data", resp))
-            return tweet_id
-        except Exception as exc:
-            logging.warning("v2 create_tweet reply failed (prefix=%s) (%s). Falling back to v1.1.", account_prefix or "", exc)
-
-    # Fallback to v1.1
-    if twitter_client is not None:
-        try:
-            resp = twitter_client.update_status(status=text, in_reply_to_status_id=reply_to_tweet_id)
-            tweet_id = resp.id_str if hasattr(resp, "id_str") else None
-            logging.info("Reply posted via v1.1 (prefix=%s): %s", account_prefix or "", text)
-            return tweet_id
-        except Exception as exc:
-            logging.error("Failed to post reply (prefix=%s): %s", account_prefix or "", exc)
-            return None
+@lru_cache(maxsize=8)
+def _async_twitter_client(account_prefix: str):
+    # tweepy.asynchronous needs the tweepy[async] extra (aiohttp), so it's only
+    # imported by the code paths that post concurrently.
+    from tweepy.asynchronous import AsyncClient
+
+    creds = _load_twitter_credentials(account_prefix)
+    if not creds:
+        raise RuntimeError(f"Missing Twitter credentials for prefix '{account_prefix}'")
+    # No session is pinned to the client, so it's safe to reuse across event loops.
+    return AsyncClient(
+        consumer_key=creds.consumer_key,
+        consumer_secret=creds.consumer_secret,
+        access_token=creds.access_token,
+        access_token_secret=creds.access_secret,
+    )
+
+
+async def post_tweet_async(
+    text: str, account_prefix: str | None = None, reply_to_tweet_id: str | None = None, dry_run: bool | None = None
+) -> str | None:
+    """Post a tweet (or a reply) via the v2 async client. Returns tweet ID.
+
+    Unlike post_tweet there is no v1.1 fallback; failures are logged and
+    return None so one bad post doesn't cancel the rest of a gather().
+    account_prefix="auto" rotates across accounts and dry_run defaults to
+    DRY_RUN, as with post_tweet.
+    """
+    result = await attempt_tweet_async(text, account_prefix, reply_to_tweet_id, dry_run)
+    return None if isinstance(result, PostFailure) else result
 
-    return None
+
+async def attempt_tweet_async(
+    text: str, account_prefix: str | None = None, reply_to_tweet_id: str | None = None, dry_run: bool | None = None
+) -> str | PostFailure | None:
+    """Like post_tweet_async, but a failure comes back as the PostFailure saying why.
+
+    A failure in NOT_POSTED means the tweet certainly wasn't created, so the
+    caller can safely send it again later.
+    """
+    if DRY_RUN if dry_run is None else dry_run:
+        logging.info("[DRY RUN] Tweet would be (prefix=%s, reply_to=%s): %s", account_prefix or "", reply_to_tweet_id, text)
+        return "dry_run_reply_id" if reply_to_tweet_id else "dry_run_tweet_id"
+    if account_prefix != AUTO_ACCOUNT:
+        return await _post_as_async(text, reply_to_tweet_id, account_prefix or "")
+    for prefix in _rotation():
+        result = await _post_as_async(text, reply_to_tweet_id, prefix)
+        if result not in NOT_POSTED:
+            return result
+    return PostFailure.NO_BUDGET
+
+
+async def _post_as_async(text: str, reply_to: str | None, prefix: str) -> str | PostFailure | None:
+    if not POST_BUDGET.try_consume(prefix, POST_ROUTE):
+        logging.warning("Post budget exhausted (prefix=%s); skipping tweet.", prefix)
+        return PostFailure.NO_BUDGET
+    try:
+        resp = await _async_twitter_client(prefix).create_tweet(text=text, in_reply_to_tweet_id=reply_to)
+    except Exception as exc:
+        failure = _failure_from(exc, prefix)
+        if failure is PostFailure.ERROR:
+            logging.error("Failed to post tweet (prefix=%s): %s", prefix, exc)
+        return failure
+    logging.info("Tweet posted via async v2 (prefix=%s): %s", prefix, getattr(resp, "data", resp))
+    return _v2_tweet_id(resp)
 
 
 def check_secondary_twitter_api_keys():
     """Check if secondary Twitter API keys are set."""
-    if os.getenv("X2_CONSUMER_KEY") is None or os.getenv("X2_CONSUMER_SECRET") is None or os.getenv("X2_ACCESS_TOKEN") is None or os.getenv("X2_ACCESS_TOKEN_SECRET") is None:
-        return False
-    return True
+    return SECONDARY_ACCOUNT_PREFIX in _all_twitter_credentials()
 
 
 def print_market_wrap(market_wrap: NewsTopicWrap):
-    # Add ANSI color codes for colored terminal output
-    CYAN = "\033[96m"
-    GREEN = "\033[92m"
-    YELLOW = "\033[93m"
-    RESET = "\033[0m"
-
-    print(f"{CYAN}Tweet:{RESET}")
-    print(f"{GREEN}{market_wrap.tweet}{RESET}")
-    print(f"\n{CYAN}Summary:{RESET}")
-    print(f"{market_wrap.summary}")
-    print(f"\n{CYAN}Citations:{RESET}")
-    for citation in market_wrap.citations:
-        print(f"{YELLOW}{citation}{RESET}")
-    print(f"{RESET}")
-    print("\n")
+    # Build the whole block first so it goes out in a single write
+    citations = "".join(f"{_YELLOW}{citation}{_RESET}\n" for citation in market_wrap.citations)
+    sys.stdout.write(
+        f"{_CYAN}Tweet:{_RESET}\n"
+        f"{_GREEN}{market_wrap.tweet}{_RESET}\n"
+        f"\n{_CYAN}Summary:{_RESET}\n"
+        f"{market_wrap.summary}\n"
+        f"\n{_CYAN}Citations:{_RESET}\n"
+        f"{citations}"
+        f"{_RESET}\n"
+        "\n\n"
+    )
 
 
-def generate_market_wrap(topic: str):
-    generator = Generator()
-    attempts = 0
-    market_wrap: NewsTopicWrap | None = None
-    while attempts < 5:
-        market_wrap = generator.generate_summary(topic)
-        tweet_text = market_wrap.tweet or ""
-        if len(tweet_text) <= MAX_TWEET_LEN:
-            break
-        attempts += 1
-        logging.info(
-            "Tweet too long (%d chars > %d). Regenerating (%d/5)…",
-            len(tweet_text),
-            MAX_TWEET_LEN,
-            attempts,
-        )
+# Entered around every OpenAI request, e.g. to cap requests in flight; no-op by default
+RequestSlot = Callable[[], AbstractAsyncContextManager]
+
+
+async def _race_candidates(
+    generator: Generator, topic: str, candidates: int, slot: RequestSlot = nullcontext
+) -> tuple[NewsTopicWrap | None, NewsTopicWrap | None]:
+    """Run `candidates` generations concurrently; return (first that fits, last one seen).
+
+    The remaining generations are cancelled as soon as one fits.
+    """
+
+    async def candidate() -> NewsTopicWrap:
+        async with slot():
+            return await generator.generate_summary_async(topic, refresh=True)
+
+    tasks = [asyncio.create_task(candidate()) for _ in range(candidates)]
+    last: NewsTopicWrap | None = None
+    error: Exception | None = None
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                market_wrap = await next_done
+            except Exception as exc:
+                logging.warning("Candidate generation failed: %s", exc)
+                error = exc
+                continue
+            last = market_wrap
+            if tweet_length(market_wrap.tweet) <= MAX_TWEET_LEN:
+                return market_wrap, last
+            logging.info("Candidate tweet too long (%d chars > %d)", tweet_length(market_wrap.tweet), MAX_TWEET_LEN)
+    finally:
+        for task in tasks:
+            task.cancel()
+    if last is None and error is not None:
+        raise error
+    return None, last
+
+
+async def generate_market_wrap_async(
+    generator: Generator, topic: str, candidates: int = TWEET_CANDIDATES, slot: RequestSlot = nullcontext
+) -> NewsTopicWrap:
+    """Return a wrap whose tweet fits MAX_TWEET_LEN.
+
+    A fitting cached wrap is used as is. Otherwise a single draft is
+    generated, and only if it is too long do later rounds race `candidates`
+    concurrent generations, keeping the first that fits. Every generation is
+    billed even when its task is cancelled, so the common case stays one call.
+    """
+    market_wrap = generator.cached_summary(topic)
+    if market_wrap is not None and tweet_length(market_wrap.tweet) <= MAX_TWEET_LEN:
+        return market_wrap
+
+    for round_no in range(1, TWEET_ROUNDS + 1):
+        fitting, market_wrap = await _race_candidates(generator, topic, 1 if round_no == 1 else candidates, slot)
+        if fitting is not None:
+            return fitting
+        logging.info("No candidate tweet fit in %d chars (round %d/%d)", MAX_TWEET_LEN, round_no, TWEET_ROUNDS)
     # Final safety: if still too long after retries, clamp to fit
-    if market_wrap and len(market_wrap.tweet or "") > MAX_TWEET_LEN:
+    if market_wrap and tweet_length(market_wrap.tweet) > MAX_TWEET_LEN:
         market_wrap.tweet = clamp_tweet(market_wrap.tweet, MAX_TWEET_LEN)
     return market_wrap
 
 
-def generate_response_tweet(original_tweet: str, responder_topic: str) -> NewsTopicWrap:
-    """Generate a response tweet that replies to the original tweet."""
+def generate_market_wrap(topic: str):
+    return asyncio.run(generate_market_wrap_async(Generator(), topic))
+
+
+async def generate_all_market_wraps(
+    topic_keys: Sequence[str],
+    max_concurrency: int = MAX_CONCURRENCY,
+    on_ready: Callable[[str, NewsTopicWrap, NewsTopicWrap | None], None] | None = None,
+    conversation: bool = False,
+) -> dict[str, NewsTopicWrap]:
+    """Generate wraps for several topics concurrently.
+
+    Every OpenAI request (each raced candidate, not just each topic) takes a
+    slot, so at most max_concurrency requests are in flight and, with
+    OPENAI_RPM set, they stay under that requests-per-minute budget.
+    on_ready(topic_key, wrap, response_wrap) is called as each topic finishes
+    so callers can start posting before the rest are done; response_wrap is
+    only generated in conversation mode. Topics that fail are logged and left
+    out of the result.
+    """
     generator = Generator()
-    
-    # Create response prompt that includes the original tweet
-    response_prompt = f"{responder_topic}\n\nRespond to this tweet: '{original_tweet}'\nMake it conversational and add your own perspective."
-    
-    attempts = 0
-    market_wrap: NewsTopicWrap | None = None
-    while attempts < 5:
-        market_wrap = generator.generate_summary(response_prompt)
-        tweet_text = market_wrap.tweet or ""
-        if len(tweet_text) <= MAX_TWEET_LEN:
-            break
-        attempts += 1
-        logging.info(
-            "Response tweet too long (%d chars > %d). Regenerating (%d/5)…",
-            len(tweet_text),
-            MAX_TWEET_LEN,
-            attempts,
-        )
-    # Final safety: if still too long after retries, clamp to fit
-    if market_wrap and len(market_wrap.tweet or "") > MAX_TWEET_LEN:
-        market_wrap.tweet = clamp_tweet(market_wrap.tweet, MAX_TWEET_LEN)
-    return market_wrap
+    sem = asyncio.Semaphore(max_concurrency)
+    limiter = AsyncRateLimiter(OPENAI_RPM) if OPENAI_RPM > 0 else None
+
+    @asynccontextmanager
+    async def slot() -> AsyncIterator[None]:
+        async with sem:
+            if limiter is not None:
+                await limiter.acquire()
+            yield
+
+    async def one(topic_key: str) -> NewsTopicWrap:
+        if conversation:
+            market_wrap, response_wrap = await generate_conversation_async(generator, topic_key, slot)
+        else:
+            market_wrap, response_wrap = await generate_market_wrap_async(generator, TOPICS[topic_key], slot=slot), None
+        if on_ready is not None:
+            on_ready(topic_key, market_wrap, response_wrap)
+        return market_wrap
+
+    results = await asyncio.gather(*(one(k) for k in topic_keys), return_exceptions=True)
+    market_wraps = {}
+    for topic_key, result in zip(topic_keys, results):
+        if isinstance(result, BaseException):
+            logging.error("Failed to generate tweet for topic %s: %s", topic_key, result)
+            continue
+        market_wraps[topic_key] = result
+    return market_wraps
+
+
+def generate_bundled_market_wraps(topic_keys: Sequence[str]) -> dict[str, NewsTopicWrap]:
+    """Generate wraps for several topics with a single OpenAI request.
+
+    There is no per-topic regeneration here; over-long tweets are clamped.
+    """
+    bundle = Generator().generate_bundle({k: TOPICS[k] for k in topic_keys})
+    market_wraps = {}
+    for topic_key in topic_keys:
+        market_wrap = bundle.get(topic_key)
+        if market_wrap is None:
+            logging.error("No tweet generated for topic %s", topic_key)
+            continue
+        if tweet_length(market_wrap.tweet) > MAX_TWEET_LEN:
+            market_wrap.tweet = clamp_tweet(market_wrap.tweet, MAX_TWEET_LEN)
+        market_wraps[topic_key] = market_wrap
+    return market_wraps
+
+
+async def generate_conversation_async(
+    generator: Generator, topic_key: str, slot: RequestSlot = nullcontext
+) -> tuple[NewsTopicWrap, NewsTopicWrap]:
+    """Generate the primary wrap and the responder's reply in a single request."""
+    async with slot():
+        market_wrap, response_wrap = await generator.generate_pair_async(TOPICS[topic_key], get_responder_topic(topic_key))
+    # One request yields both tweets, so there is no per-tweet regeneration; clamp instead
+    for wrap in (market_wrap, response_wrap):
+        if tweet_length(wrap.tweet) > MAX_TWEET_LEN:
+            wrap.tweet = clamp_tweet(wrap.tweet, MAX_TWEET_LEN)
+    return market_wrap, response_wrap
+
+
+def publish_market_wrap(market_wrap: NewsTopicWrap, response_wrap: NewsTopicWrap | None = None, responder_prefix: str | None = None):
+    """Post the wrap's tweet and, in conversation mode, response_wrap as a reply from the responder account."""
+    primary_tweet_id = post_tweet(market_wrap.tweet)
+
+    # If conversation mode is enabled, post the pre-generated response
+    if response_wrap is not None and primary_tweet_id:
+        reply_tweet_id = post_reply_tweet(response_wrap.tweet, primary_tweet_id, account_prefix=responder_prefix)
+        if reply_tweet_id:
+            logging.info("Conversation posted successfully!")
+        else:
+            logging.warning("Failed to post response tweet")
+    elif response_wrap is not None:
+        logging.warning("Conversation mode enabled but primary tweet failed, skipping response")
+
 
 # good default call is python poster.py us-markets
-def main():
+@lru_cache(maxsize=1)
+def _get_parser() -> "argparse.ArgumentParser":
+    # Built once per process so repeated main() calls reuse it. argparse is
+    # imported here so modules that only import poster's helpers don't pay for it.
+    import argparse
+
     parser = argparse.ArgumentParser(description="Generate and post tweets about various topics")
     parser.add_argument(
         "topic", 
-        choices=list(TOPICS.keys()),
-        help="Topic to generate content about"
+        nargs="?",
+        choices=_TOPIC_CHOICES,
+        help=f"Topic to generate content about ('{ALL_TOPICS}' generates every topic concurrently)"
     )
     parser.add_argument(
         "--conversation",
         action="store_true",
         help="Enable conversation mode with two accounts (primary posts, secondary responds)"
     )
-    
+    parser.add_argument(
+        "--responder-prefix",
+        default=SECONDARY_ACCOUNT_PREFIX,
+        help="Env var prefix for the responding account in conversation mode (e.g., X2 reads X2_X_CONSUMER_KEY)"
+    )
+    parser.add_argument(
+        "--single-request",
+        action="store_true",
+        help=f"With '{ALL_TOPICS}', generate every topic in one OpenAI request instead of one request per topic"
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Submit the topic(s) to the OpenAI Batch API (half price, finishes within 24h) and print the batch id"
+    )
+    parser.add_argument(
+        "--poll-batch",
+        metavar="BATCH_ID",
+        help="Post the tweets from a finished --batch run (no topic needed)"
+    )
+    return parser
+
+
+def main():
+    parser = _get_parser()
     args = parser.parse_args()
-    
-    topic_description = TOPICS[args.topic]
-    logging.info(f"Generating tweet with OpenAI + Web Search for topic: {args.topic}\ntopic_description: {topic_description}")
-    
-    # Generate and post primary tweet
-    market_wrap = generate_market_wrap(topic=topic_description)
-    print_market_wrap(market_wrap)    
-    primary_tweet_id = post_tweet(market_wrap.tweet, account="primary")
-    
-    # If conversation mode is enabled, generate and post response
-    if args.conversation and primary_tweet_id:
-        logging.info("Generating response tweet...")
-        responder_topic = get_responder_topic(args.topic)
-        response_wrap = generate_response_tweet(market_wrap.tweet, responder_topic)
-        
-        print(f"\n{'='*50}")
-        print("RESPONSE TWEET:")
-        print_market_wrap(response_wrap)
-        
-        reply_tweet_id = post_reply_tweet(response_wrap.tweet, primary_tweet_id, account="secondary")
-        if reply_tweet_id:
-            logging.info("Conversation posted successfully!")
+    if not args.topic and not args.poll_batch:
+        parser.error("topic is required unless --poll-batch is given")
+    if args.conversation and (args.poll_batch or args.batch or args.single_request):
+        parser.error("--conversation can't be combined with --batch, --poll-batch or --single-request")
+
+    pending = []
+
+    def publish(topic_key: str, market_wrap: NewsTopicWrap, response_wrap: NewsTopicWrap | None = None):
+        # Posting runs on _POST_POOL so it overlaps with any generation still in flight.
+        print_market_wrap(market_wrap)
+        if response_wrap is not None:
+            print(f"\n{'='*50}")
+            print("RESPONSE TWEET:")
+            print_market_wrap(response_wrap)
+        pending.append(_POST_POOL.submit(publish_market_wrap, market_wrap, response_wrap, args.responder_prefix))
+
+    if args.poll_batch:
+        market_wraps = Generator().poll_batch(args.poll_batch)
+        if market_wraps is None:
+            logging.info("Batch %s is still running; poll again later", args.poll_batch)
+            return
+        for topic_key, market_wrap in market_wraps.items():
+            if tweet_length(market_wrap.tweet) > MAX_TWEET_LEN:
+                market_wrap.tweet = clamp_tweet(market_wrap.tweet, MAX_TWEET_LEN)
+            publish(topic_key, market_wrap)
+    elif args.batch:
+        topic_keys = TOPIC_KEYS if args.topic == ALL_TOPICS else (args.topic,)
+        batch_id = Generator().submit_batch({k: TOPICS[k] for k in topic_keys})
+        print(f"Submitted batch {batch_id}; run `python poster.py --poll-batch {batch_id}` once it completes")
+    elif args.topic == ALL_TOPICS and args.single_request:
+        logging.info("Generating tweets with OpenAI + Web Search for all %d topics in a single request", len(TOPICS))
+        for topic_key, market_wrap in generate_bundled_market_wraps(TOPIC_KEYS).items():
+            publish(topic_key, market_wrap)
+    elif args.topic == ALL_TOPICS:
+        logging.info("Generating tweets with OpenAI + Web Search for all %d topics (max concurrency %d)", len(TOPICS), MAX_CONCURRENCY)
+        asyncio.run(generate_all_market_wraps(TOPIC_KEYS, on_ready=publish, conversation=args.conversation))
+    else:
+        topic_description = TOPICS[args.topic]
+        logging.info(f"Generating tweet with OpenAI + Web Search for topic: {args.topic}\ntopic_description: {topic_description}")
+        if args.conversation:
+            publish(args.topic, *asyncio.run(generate_conversation_async(Generator(), args.topic)))
         else:
-            logging.warning("Failed to post response tweet")
-    elif args.conversation:
-        logging.warning("Conversation mode enabled but primary tweet failed, skipping response")
+            publish(args.topic, generate_market_wrap(topic=topic_description))
+
+    # Wait for the posts and surface any error they raised
+    for future in as_completed(pending):
+        future.result()
 
 
 if __name__ == "__main__":
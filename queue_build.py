@@ -1,29 +1,57 @@
-import json
 import os
+import re
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 import argparse
 
 from dotenv import load_dotenv
-from openai import OpenAI
-from poster import TOPICS
+import jsonio
+from poster import TOPICS, clamp_tweet
+
+_TOPIC_SEP = re.compile(r"[,\s]+")
+# How much of a malformed response is sent back for JSON repair
+_REPAIR_CHARS = 4000
+
+
+@dataclass(frozen=True, slots=True)
+class QueueItem:
+    topic: str
+    tweet: str
+    summary: str
+    citations: tuple[str, ...]
+    created_at: str
+
+
+def _output_text(resp) -> str:
+    """Join the output_text parts of a Responses API result in one pass."""
+    return "\n".join(
+        text
+        for item in getattr(resp, "output", None) or ()
+        for part in getattr(item, "content", None) or ()
+        if getattr(part, "type", None) == "output_text"
+        and (text := getattr(part, "text", ""))
+    ).strip()
 
 
 def generate_queue(topics: List[str]) -> Dict[str, Any]:
     """Generate a queue of tweets for many topics using ONE LLM call."""
+    from openai import OpenAI
+
     load_dotenv()
     client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY", ""))
 
-    # Build concise batch prompt to minimize tokens
-    topic_lines = []
-    for idx, t in enumerate(topics, start=1):
-        topic_lines.append(f"{idx}. {t}")
+    # Only ask about each distinct topic once; duplicates are expanded below
+    unique_topics = list(dict.fromkeys(topics))
+
+    # One timestamp for every item, whether generation succeeds or not
+    now_iso = datetime.now(timezone.utc).isoformat()
     batch_prompt = (
         "Generate tweet content for the topics below.\n"
         "For EACH topic, output a JSON object with keys: topic, tweet, summary, citations (array of URLs).\n"
         "Constraints: tweet ≤260 chars, no emojis/hashtags/links; summary ≤3 short paragraphs, conversational.\n"
         "Return a JSON array ONLY (no extra text).\n\n"
-        + "\n".join(topic_lines)
+        + "\n".join(f"{idx}. {t}" for idx, t in enumerate(unique_topics, start=1))
     )
 
     try:
@@ -37,55 +65,60 @@ def generate_queue(topics: List[str]) -> Dict[str, Any]:
             tool_choice="auto",
         )
 
-        # Extract text from response
-        text_chunks: List[str] = []
-        for item in getattr(resp, "output", []) or []:
-            for part in getattr(item, "content", []) or []:
-                if getattr(part, "type", None) == "output_text":
-                    text_chunks.append(getattr(part, "text", ""))
-        raw_json = "\n".join([t for t in text_chunks if t]).strip()
-
-        data = json.loads(raw_json)
-        items = []
-        now_iso = datetime.now(timezone.utc).isoformat()
-        for obj in data:
-            items.append(
-                {
-                    "topic": obj.get("topic", ""),
-                    "tweet": obj.get("tweet", ""),
-                    "summary": obj.get("summary", ""),
-                    "citations": obj.get("citations", []) or [],
-                    "created_at": now_iso,
-                }
+        raw_json = _output_text(resp)
+        try:
+            data = jsonio.loads(raw_json)
+        except ValueError:
+            # One repair round-trip is far cheaper than throwing away the
+            # whole generation; a second failure falls through to the fallback.
+            repair = client.responses.create(
+                model="gpt-5-nano",
+                input=[
+                    {"role": "system", "content": "Reply with valid JSON only."},
+                    {"role": "user", "content": "Fix to a strict JSON array:\n" + raw_json[:_REPAIR_CHARS]},
+                ],
+            )
+            data = jsonio.loads(_output_text(repair))
+        if len(topics) != len(unique_topics) and len(data) == len(unique_topics):
+            position = {t: i for i, t in enumerate(unique_topics)}
+            data = [data[position[t]] for t in topics]
+        items = [
+            QueueItem(
+                topic=obj.get("topic", ""),
+                # Clamped once here so queue_post can post items as-is
+                tweet=clamp_tweet(obj.get("tweet", "")),
+                summary=obj.get("summary", ""),
+                citations=tuple(obj.get("citations") or ()),
+                created_at=now_iso,
             )
-        return {"queue": items, "generated_at": now_iso}
+            for obj in data
+        ]
+        return {"queue": items, "generated_at": now_iso, "clamped": True}
     except Exception as exc:
         # Fallback: minimal structure to avoid breaking workflows
-        now_iso = datetime.now(timezone.utc).isoformat()
         return {
             "queue": [
-                {
-                    "topic": t,
-                    "tweet": "Generation failed; will retry later.",
-                    "summary": "",
-                    "citations": [],
-                    "created_at": now_iso,
-                }
+                QueueItem(
+                    topic=t,
+                    tweet="Generation failed; will retry later.",
+                    summary="",
+                    citations=(),
+                    created_at=now_iso,
+                )
                 for t in topics
             ],
             "generated_at": now_iso,
+            "clamped": True,
             "error": str(exc),
         }
 
 
 def write_queue_file(queue: Dict[str, Any], path: str = "queue.json") -> None:
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(queue, f, ensure_ascii=False, indent=2)
+    jsonio.write_atomic(path, queue, pretty=True)
 
 
-def _parse_topic_keys(raw: str) -> List[str]:
-    parts = [p.strip() for p in (raw or "").replace(",", " ").split() if p.strip()]
-    return parts
+def _parse_topic_keys(raw: str) -> Tuple[str, ...]:
+    return tuple(p for p in _TOPIC_SEP.split((raw or "").strip()) if p)
 
 
 def main() -> None:
